@@ -1,10 +1,16 @@
+from pathlib import Path
+
 from pydantic import PostgresDsn, computed_field
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
-    MOVIES_DATA_PATH: str = "C:/Users/San/Documents/CS projects/MRS/DA_skill_showcase/data/recommender_data.csv"
+    MOVIES_DATA_PATH: str = str(
+        Path(__file__).resolve().parents[2] / "DA_skill_showcase/data/recommender_data.csv"
+    )
+    # Movies sent to the database per COPY
+    INGEST_CHUNK_SIZE: int = 10_000
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str = "postgres"
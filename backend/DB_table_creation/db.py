@@ -1,18 +1,21 @@
+import logging
+
 from sqlmodel import SQLModel, Session, create_engine, select
-import pandas as pd
 
 from crud import create_user
 from config import settings
+from ingest import copy_items
 from models import User, UserCreate
 
 
 engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+logger = logging.getLogger(__name__)
 
 
 # Make sure all SQLModel models are imported before initializing DB.
 # Otherwise, SQLModel might fail to initialize relationships properly.
 # For more details: https://github.com/tiangolo/full-stack-fastapi-template/issues/28
-def init_db(session: Session) -> None:
+def init_db(session: Session, path: str | None = None, mode: str = "append") -> None:
     # This works because the models are already imported and registered from app.models
     SQLModel.metadata.create_all(engine)
 
@@ -27,10 +30,14 @@ def init_db(session: Session) -> None:
         )
         user = create_user(session=session, user_create=user_in)
 
-    # Fill table 'item' with movie data
-    df = pd.read_csv(settings.MOVIES_DATA_PATH)
-    df["owner_id"] = 1  # set admin to be the owner
-    # Drop the 'id' column to allow the database to auto-generate IDs.
-    # Without this, autoincrement won't update and will start at 1 making errors
-    df = df.drop(columns=["id"])
-    df.to_sql(name="item", con=engine, if_exists="append", index=False)
+    # Fill table 'item' with movie data, owned by the admin. The 'id' column of
+    # the file isn't copied, so the database auto-generates IDs and its
+    # autoincrement stays in sync
+    updated, inserted = copy_items(
+        engine,
+        path or settings.MOVIES_DATA_PATH,
+        owner_id=user.id,
+        mode=mode,
+        chunk_size=settings.INGEST_CHUNK_SIZE,
+    )
+    logger.info("Movies updated: %d, inserted: %d", updated, inserted)
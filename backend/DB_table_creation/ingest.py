@@ -0,0 +1,157 @@
+import logging
+
+import pandas as pd
+from sqlalchemy import Engine
+
+logger = logging.getLogger(__name__)
+
+# Columns of table 'item' filled from the movie data, 'id' is generated by the database
+ITEM_COLUMNS = (
+    "title",
+    "franchise",
+    "release_year",
+    "genres",
+    "vote_average",
+    "vote_count",
+    "director",
+    "top_actors",
+    "keywords",
+    "owner_id",
+)
+# Movies with the same values in these columns are the same movie on re-import
+DEDUP_KEY = ("title", "release_year", "director")
+# Columns overwritten when a re-imported movie already exists, the owner is kept
+UPDATE_COLUMNS = tuple(
+    column for column in ITEM_COLUMNS if column not in DEDUP_KEY and column != "owner_id"
+)
+
+
+def read_chunks(path, chunk_size, owner_id):
+    """
+    Summary:
+        Streams the movie data file in chunks, so files of any size fit in memory.
+    Parameters:
+        path (str): CSV file with the movie data.
+        chunk_size (int): Number of movies per chunk.
+        owner_id (int): Id of the user owning the imported movies.
+    Returns:
+        Iterator[list[tuple]]: Rows of every chunk, ordered like ITEM_COLUMNS, None for missing values.
+    """
+    for chunk in pd.read_csv(
+        path, chunksize=chunk_size, dtype={"release_year": str, "vote_count": "Int64"}
+    ):
+        chunk["owner_id"] = owner_id
+        chunk = chunk[list(ITEM_COLUMNS)].astype(object)
+        yield [tuple(row) for row in chunk.where(chunk.notna(), None).values.tolist()]
+
+
+def number_rows(chunks):
+    """
+    Summary:
+        Appends its line in the file, counted from 1, to every row.
+    """
+    line = 0
+    for rows in chunks:
+        yield [(*row, line + offset) for offset, row in enumerate(rows, start=1)]
+        line += len(rows)
+
+
+def copy_rows(cursor, table, chunks, columns=ITEM_COLUMNS):
+    """
+    Summary:
+        Streams rows into a table with PostgreSQL COPY, one COPY per chunk.
+    Returns:
+        int: Number of copied rows.
+    """
+    copied = 0
+    for rows in chunks:
+        with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+        copied += len(rows)
+        logger.info("Copied %d movies", copied)
+    return copied
+
+
+def dedup_key(table=None):
+    """
+    Summary:
+        DEDUP_KEY columns, qualified by the table if given, as expressions that
+        treat missing values as empty. Movies are matched on them with plain
+        equality, which the indexes created by merge_import and hash joins support.
+    """
+    prefix = f"{table}." if table else ""
+    return [f"coalesce({prefix}{column}, '')" for column in DEDUP_KEY]
+
+
+def merge_import(cursor):
+    """
+    Summary:
+        Merges the movies of table 'item_import' into table 'item'. Movies that
+        already exist, by DEDUP_KEY, are updated, the others are inserted.
+        Duplicates within the import are only inserted once, the last one in
+        the file wins.
+    Returns:
+        tuple[int, int]: Number of updated and of inserted movies.
+    """
+    columns = ", ".join(ITEM_COLUMNS)
+    item_key = dedup_key("item")
+    import_key = dedup_key("item_import")
+    incoming_key = dedup_key("incoming")
+    index_key = ", ".join(f"({expression})" for expression in dedup_key())
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS ix_item_dedup_key ON item ({index_key})")
+    cursor.execute(f"CREATE INDEX ON item_import ({index_key})")
+    # Autovacuum doesn't analyze temporary tables
+    cursor.execute("ANALYZE item_import")
+    matches = " AND ".join(
+        f"{item} = {incoming}" for item, incoming in zip(item_key, incoming_key)
+    )
+    incoming = (
+        f"SELECT DISTINCT ON ({', '.join(import_key)}) {columns} FROM item_import "
+        f"ORDER BY {', '.join(import_key)}, line DESC"
+    )
+    cursor.execute(
+        f"""
+        UPDATE item
+        SET {", ".join(f"{column} = incoming.{column}" for column in UPDATE_COLUMNS)}
+        FROM ({incoming}) AS incoming
+        WHERE {matches}
+        """
+    )
+    updated = cursor.rowcount
+    cursor.execute(
+        f"""
+        INSERT INTO item ({columns})
+        SELECT {columns} FROM ({incoming}) AS incoming
+        WHERE NOT EXISTS (SELECT 1 FROM item WHERE {matches})
+        """
+    )
+    return updated, cursor.rowcount
+
+
+def copy_items(engine: Engine, path, owner_id, mode="append", chunk_size=10_000):
+    """
+    Summary:
+        Loads movie data into table 'item' with PostgreSQL COPY, in chunks and
+        in a single transaction.
+    Parameters:
+        engine (Engine): Engine of the database.
+        path (str): CSV file with the movie data.
+        owner_id (int): Id of the user owning the imported movies.
+        mode (str): "append" copies every movie straight into the table. "upsert" copies
+            into a temporary table first and merges it, so re-imports update existing
+            movies instead of duplicating them.
+        chunk_size (int): Number of movies per COPY.
+    Returns:
+        tuple[int, int]: Number of updated and of inserted movies.
+    """
+    chunks = read_chunks(path, chunk_size, owner_id)
+    with engine.begin() as connection, connection.connection.cursor() as cursor:
+        if mode == "append":
+            return 0, copy_rows(cursor, "item", chunks)
+        cursor.execute(
+            f"CREATE TEMP TABLE item_import ON COMMIT DROP AS "
+            f"SELECT {', '.join(ITEM_COLUMNS)}, 0::bigint AS line FROM item WITH NO DATA"
+        )
+        copy_rows(cursor, "item_import", number_rows(chunks), (*ITEM_COLUMNS, "line"))
+        return merge_import(cursor)
@@ -1,4 +1,8 @@
+import argparse
 import logging
+import subprocess
+import sys
+from pathlib import Path
 
 from sqlmodel import Session
 
@@ -7,16 +11,42 @@ from db import engine, init_db
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The recommender is part of the app, it's built from the 'backend' directory
+BACKEND_DIR = Path(__file__).resolve().parents[1]
 
-def init() -> None:
+
+def init(path: str | None = None, mode: str = "append") -> None:
     with Session(engine) as session:
-        init_db(session)
+        init_db(session, path=path, mode=mode)
+
+
+def build_recommender() -> None:
+    subprocess.run(
+        [sys.executable, "-m", "app.recommender.build"], cwd=BACKEND_DIR, check=True
+    )
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create the tables, the admin and the movies, then build the recommender."
+    )
+    parser.add_argument("--path", help="CSV file with the movie data. Defaults to MOVIES_DATA_PATH.")
+    parser.add_argument(
+        "--mode",
+        choices=("append", "upsert"),
+        default="append",
+        help="'upsert' updates movies that already exist instead of adding them again.",
+    )
+    parser.add_argument(
+        "--skip-recommender", action="store_true", help="Don't build the recommender artifacts."
+    )
+    args = parser.parse_args()
+
     logger.info("Creating initial data")
-    init()
+    init(args.path, args.mode)
     logger.info("Initial data created")
+    if not args.skip_recommender:
+        build_recommender()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,23 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
+from concurrent.futures import Executor
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_engine, engine
+from app.core.password_hasher import PasswordHasher
+from app.core.user_cache import user_cache
 from app.models import TokenPayload, User
+from app.recommender.engine import RecommenderEngine
+from app.recommender.rebuild import RebuildWorker
+from app.recommender.result_cache import ResultCache
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -22,8 +29,39 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
+def get_recommender(request: Request) -> RecommenderEngine:
+    return request.app.state.recommender
+
+
+def get_rebuild_worker(request: Request) -> RebuildWorker:
+    return request.app.state.rebuild_worker
+
+
+def get_result_cache(request: Request) -> ResultCache:
+    return request.app.state.result_cache
+
+
+def get_recommender_pool(request: Request) -> Executor:
+    return request.app.state.recommender_pool
+
+
+def get_password_hasher(request: Request) -> PasswordHasher:
+    return request.app.state.password_hasher
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
+RecommenderDep = Annotated[RecommenderEngine, Depends(get_recommender)]
+RebuildWorkerDep = Annotated[RebuildWorker, Depends(get_rebuild_worker)]
+ResultCacheDep = Annotated[ResultCache, Depends(get_result_cache)]
+RecommenderPoolDep = Annotated[Executor, Depends(get_recommender_pool)]
+PasswordHasherDep = Annotated[PasswordHasher, Depends(get_password_hasher)]
 
 
 def get_current_user(session: SessionDep, token: TokenDep) -> User:
@@ -37,7 +75,11 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+    user = user_cache.get(session, token_data.sub, token)
+    if user is None:
+        user = session.get(User, token_data.sub)
+        if user:
+            user_cache.put(user, token)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -54,3 +96,12 @@ def get_current_active_superuser(current_user: CurrentUser) -> User:
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+def hasher_overloaded() -> HTTPException:
+    # Rejected fast, so clients back off instead of queueing more bcrypt work
+    return HTTPException(
+        status_code=503,
+        detail="Too many password requests, try again later",
+        headers={"Retry-After": "1"},
+    )
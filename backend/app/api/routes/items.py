@@ -1,67 +1,247 @@
+import asyncio
+from functools import partial
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from sqlmodel import func, select
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemOut, ItemsOut, ItemUpdate, Message
+from app.api.deps import (
+    AsyncSessionDep,
+    CurrentUser,
+    RebuildWorkerDep,
+    RecommenderDep,
+    RecommenderPoolDep,
+    ResultCacheDep,
+)
+from app.core.metrics import item_fetch_time
+from app.core.pagination import decode_cursor, next_cursor, row_counts
+from app.models import (
+    Item,
+    ItemCreate,
+    ItemOut,
+    ItemsOut,
+    ItemUpdate,
+    Message,
+    RecommendationAttributesIn,
+    RecommendationOut,
+    RecommendationsBatchIn,
+    RecommendationsBatchOut,
+    RecommenderStatus,
+    ResultCacheStats,
+)
 from app.recommender.utils.find_movie import find_movie
-from app.recommender.utils.calc_cosine_sim import calc_cosine_sim
-from app.recommender.recommender import recommender
+from app.recommender.recommender import recommend_attributes, recommend_batch, recommender
+from app.recommender.utils.title_index import normalize_title
 
 router = APIRouter()
 
 
+async def run_in_pool(pool, func, *args, **kwargs):
+    """
+    Runs CPU-bound recommender work in the pool and waits for it without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, partial(func, *args, **kwargs))
+
+
 @router.get("/", response_model=ItemsOut)
-def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+async def read_items(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
 ) -> Any:
     """
-    Retrieve all items from all users.
+    Retrieve all items from all users, newest first. Pass next_cursor of a page
+    as cursor to get the next one, skip is only applied without a cursor.
     """
-    count_statement = select(func.count()).select_from(Item)
-    count = session.exec(count_statement).one()
-    statement = select(Item).offset(skip).limit(limit).order_by(Item.id.desc())
-    items = session.exec(statement).all()
-    return ItemsOut(data=items, count=count)
+    count = row_counts.get("item")
+    if count is None:
+        generation = row_counts.generation("item")
+        count = (await session.exec(select(func.count()).select_from(Item))).one()
+        row_counts.put("item", count, generation)
+    statement = select(Item).order_by(Item.id.desc()).limit(limit)
+    if cursor is not None:
+        try:
+            statement = statement.where(Item.id < decode_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        statement = statement.offset(skip)
+    items = (await session.exec(statement)).all()
+    return ItemsOut(data=items, count=count, next_cursor=next_cursor(items, limit))
 
 
 @router.get("/{id}", response_model=ItemOut)
-def read_item(session: SessionDep, current_user: CurrentUser, id: int) -> Any:
+async def read_item(session: AsyncSessionDep, current_user: CurrentUser, id: int) -> Any:
     """
     Get item by ID.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
 
 
 @router.get("/str/{input_title}", response_model=ItemOut)
-def find_item_by_title(session: SessionDep, current_user: CurrentUser, input_title: str) -> Any:
+async def find_item_by_title(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rec_engine: RecommenderDep,
+    result_cache: ResultCacheDep,
+    pool: RecommenderPoolDep,
+    input_title: str,
+) -> Any:
     """
     Get item by title.
     """
-    movie_row = find_movie(input_title)
-    movie_row_id = movie_row["id"]
-    item = session.get(Item, movie_row_id)
+    key = ("title", normalize_title(input_title))
+    generation = rec_engine.generation
+    cached = result_cache.get(key, generation)
+    if cached is not None:
+        return cached
+    movie_row = await run_in_pool(pool, find_movie, input_title, *rec_engine.lookup_state())
+    if movie_row.empty:
+        raise HTTPException(status_code=404, detail="Item not found")
+    with item_fetch_time.time(route="find"):
+        item = await session.get(Item, int(movie_row["id"].iloc[0]))
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    item = ItemOut.model_validate(item)
+    result_cache.put(key, generation, item)
     return item
 
 
+@router.get("/recommender/status", response_model=RecommenderStatus)
+async def recommender_status(
+    current_user: CurrentUser,
+    rec_engine: RecommenderDep,
+    rebuild_worker: RebuildWorkerDep,
+    result_cache: ResultCacheDep,
+) -> Any:
+    """
+    Get version and build time of the served recommender index.
+    """
+    return RecommenderStatus(
+        version=rec_engine.version,
+        built_at=rec_engine.built_at,
+        item_count=len(rec_engine.id_to_row),
+        incremental_updates=rec_engine.incremental_updates,
+        rebuild_pending=rebuild_worker.rebuild_pending,
+        rebuilding=rebuild_worker.rebuilding,
+        last_error=rebuild_worker.last_error,
+        cache=ResultCacheStats(**result_cache.stats()),
+    )
+
+
 @router.get("/recommender/{input_title}", response_model=ItemsOut)
-def recommend_movie(session: SessionDep, current_user: CurrentUser, input_title: str) -> Any:
+async def recommend_movie(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rec_engine: RecommenderDep,
+    result_cache: ResultCacheDep,
+    pool: RecommenderPoolDep,
+    input_title: str,
+    k: int = Query(default=3, ge=1, le=50),
+) -> Any:
     """
     Recommend movie by input title.
     """
-    movie_ids = recommender(input_title)
+    key = ("recommend", normalize_title(input_title), k)
+    generation = rec_engine.generation
+    cached = result_cache.get(key, generation)
+    if cached is not None:
+        return cached
+    movie_ids = await run_in_pool(pool, recommender, input_title, k, rec_engine=rec_engine)
+    statement = select(Item).where(Item.id.in_(movie_ids))
+    with item_fetch_time.time(route="recommend"):
+        items = {item.id: item for item in (await session.exec(statement)).all()}
+    # The database returns the rows in any order, keep the one of the ranking
+    data = [items[id] for id in movie_ids if id in items]
+    items_out = ItemsOut(data=data, count=len(data))
+    result_cache.put(key, generation, items_out)
+    return items_out
+
+
+@router.post("/recommender/batch", response_model=RecommendationsBatchOut)
+async def recommend_movies_batch(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rec_engine: RecommenderDep,
+    pool: RecommenderPoolDep,
+    batch_in: RecommendationsBatchIn,
+) -> Any:
+    """
+    Recommend movies for many titles or item ids at once.
+    """
+    queries = batch_in.queries
+    results = await run_in_pool(
+        pool,
+        recommend_batch,
+        [query.title for query in queries],
+        [query.item_id for query in queries],
+        [query.k for query in queries],
+        rec_engine,
+    )
+    # Fetch every matched and recommended movie with one query
+    all_ids = set()
+    for matched_id, movie_ids in results:
+        all_ids.update(movie_ids)
+        all_ids.add(matched_id)
+    statement = select(Item).where(Item.id.in_(all_ids - {None}))
+    with item_fetch_time.time(route="batch"):
+        items = {item.id: item for item in (await session.exec(statement)).all()}
+    data = []
+    for matched_id, movie_ids in results:
+        recommended = [items[id] for id in movie_ids if id in items]
+        data.append(
+            RecommendationOut(
+                item=items.get(matched_id), data=recommended, count=len(recommended)
+            )
+        )
+    return RecommendationsBatchOut(data=data, count=len(data))
+
+
+@router.post("/recommender/attributes", response_model=ItemsOut)
+async def recommend_movies_by_attributes(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rec_engine: RecommenderDep,
+    result_cache: ResultCacheDep,
+    pool: RecommenderPoolDep,
+    attributes_in: RecommendationAttributesIn,
+) -> Any:
+    """
+    Recommend movies by genres, director, actors, keywords or franchise, best match first.
+    """
+    attributes = attributes_in.model_dump(exclude={"k"})
+    # Attributes with the same tokens per field get the same recommendations
+    key = ("attributes", rec_engine.feature_engine.token_key(attributes), attributes_in.k)
+    generation = rec_engine.generation
+    cached = result_cache.get(key, generation)
+    if cached is not None:
+        return cached
+    movie_ids = await run_in_pool(
+        pool, recommend_attributes, attributes, attributes_in.k, rec_engine
+    )
     statement = select(Item).where(Item.id.in_(movie_ids))
-    items = session.exec(statement).all()
-    return ItemsOut(data=items, count=len(items))
+    with item_fetch_time.time(route="attributes"):
+        items = {item.id: item for item in (await session.exec(statement)).all()}
+    data = [items[id] for id in movie_ids if id in items]
+    items_out = ItemsOut(data=data, count=len(data))
+    result_cache.put(key, generation, items_out)
+    return items_out
 
 
 @router.post("/", response_model=ItemOut)
 async def create_item(
-    *, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+    *,
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rebuild_worker: RebuildWorkerDep,
+    pool: RecommenderPoolDep,
+    item_in: ItemCreate,
 ) -> Any:
     """
     Create new item.
@@ -70,20 +250,27 @@ async def create_item(
         raise HTTPException(status_code=400, detail="Not enough permissions")
     item = Item.model_validate(item_in, update={"owner_id": current_user.id})
     session.add(item)
-    session.commit()
-    session.refresh(item)
-    calc_cosine_sim(force_calculation=True)
+    await session.commit()
+    await session.refresh(item)
+    row_counts.invalidate("item")
+    await run_in_pool(pool, rebuild_worker.upsert_item, item)
     return item
 
 
 @router.put("/{id}", response_model=ItemOut)
 async def update_item(
-    *, session: SessionDep, current_user: CurrentUser, id: int, item_in: ItemUpdate
+    *,
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rebuild_worker: RebuildWorkerDep,
+    pool: RecommenderPoolDep,
+    id: int,
+    item_in: ItemUpdate,
 ) -> Any:
     """
     Update an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser:
@@ -91,22 +278,30 @@ async def update_item(
     update_dict = item_in.model_dump(exclude_unset=True)
     item.sqlmodel_update(update_dict)
     session.add(item)
-    session.commit()
-    session.refresh(item)
-    calc_cosine_sim(force_calculation=True)
+    await session.commit()
+    await session.refresh(item)
+    await run_in_pool(pool, rebuild_worker.upsert_item, item)
     return item
 
 
 @router.delete("/{id}")
-def delete_item(session: SessionDep, current_user: CurrentUser, id: int) -> Message:
+async def delete_item(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    rebuild_worker: RebuildWorkerDep,
+    pool: RecommenderPoolDep,
+    id: int,
+) -> Message:
     """
     Delete an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser:
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    session.delete(item)
-    session.commit()
+    await session.delete(item)
+    await session.commit()
+    row_counts.invalidate("item")
+    await run_in_pool(pool, rebuild_worker.remove_item, id)
     return Message(message="Item deleted successfully")
@@ -5,24 +5,39 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app import crud
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import (
+    AsyncSessionDep,
+    CurrentUser,
+    PasswordHasherDep,
+    get_current_active_superuser,
+    hasher_overloaded,
+)
 from app.core import security
 from app.core.config import settings
-from app.models import Token, UserOut
+from app.core.password_hasher import PasswordHasherOverloaded
+from app.models import PasswordHasherStats, Token, UserOut
 
 router = APIRouter()
 
 
 @router.post("/login/access-token")
-def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+async def login_access_token(
+    session: AsyncSessionDep,
+    hasher: PasswordHasherDep,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.authenticate(
-        session=session, email=form_data.username, password=form_data.password
-    )
+    try:
+        user = await crud.authenticate(
+            session=session,
+            email=form_data.username,
+            password=form_data.password,
+            hasher=hasher,
+        )
+    except PasswordHasherOverloaded:
+        raise hasher_overloaded()
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
@@ -41,3 +56,15 @@ def test_token(current_user: CurrentUser) -> Any:
     Test access token
     """
     return current_user
+
+
+@router.get(
+    "/login/hasher-stats",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=PasswordHasherStats,
+)
+def password_hasher_stats(hasher: PasswordHasherDep) -> Any:
+    """
+    Get load and per-operation timings of the password hasher
+    """
+    return hasher.stats()
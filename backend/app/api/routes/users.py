@@ -5,12 +5,18 @@ from sqlmodel import col, delete, func, select
 
 from app import crud
 from app.api.deps import (
+    AsyncSessionDep,
     CurrentUser,
+    PasswordHasherDep,
+    RebuildWorkerDep,
     SessionDep,
     get_current_active_superuser,
+    hasher_overloaded,
 )
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
+from app.core.pagination import decode_cursor, next_cursor, row_counts
+from app.core.password_hasher import PasswordHasherOverloaded
+from app.core.user_cache import user_cache
 from app.models import (
     Item,
     Message,
@@ -30,75 +36,112 @@ router = APIRouter()
 @router.get(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UsersOut
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep, skip: int = 0, limit: int = 100, cursor: str | None = None
+) -> Any:
     """
-    Retrieve users.
+    Retrieve users, oldest first. Pass next_cursor of a page as cursor to get
+    the next one, skip is only applied without a cursor.
     """
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    count = row_counts.get("user")
+    if count is None:
+        generation = row_counts.generation("user")
+        count = session.exec(select(func.count()).select_from(User)).one()
+        row_counts.put("user", count, generation)
 
-    statement = select(User).offset(skip).limit(limit)
+    statement = select(User).order_by(User.id).limit(limit)
+    if cursor is not None:
+        try:
+            statement = statement.where(User.id > decode_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        statement = statement.offset(skip)
     users = session.exec(statement).all()
 
-    return UsersOut(data=users, count=count)
+    return UsersOut(data=users, count=count, next_cursor=next_cursor(users, limit))
 
 
 @router.post(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UserOut
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(
+    *, session: AsyncSessionDep, hasher: PasswordHasherDep, user_in: UserCreate
+) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, user_create=user_in)
+    try:
+        user = await crud.create_user(
+            session=session, user_create=user_in, hasher=hasher
+        )
+    except PasswordHasherOverloaded:
+        raise hasher_overloaded()
+    row_counts.invalidate("user")
     return user
 
 
 @router.patch("/me", response_model=UserOut)
-def update_user_me(
-    *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
+async def update_user_me(
+    *, session: AsyncSessionDep, user_in: UserUpdateMe, current_user: CurrentUser
 ) -> Any:
     """
     Update own user.
     """
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email(session=session, email=user_in.email)
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
+    # current_user belongs to the synchronous session of the authentication
+    db_user = await session.get(User, current_user.id)
     user_data = user_in.model_dump(exclude_unset=True)
-    current_user.sqlmodel_update(user_data)
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    return current_user
+    db_user.sqlmodel_update(user_data)
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+    user_cache.invalidate(current_user.id)
+    return db_user
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(
-    *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
+async def update_password_me(
+    *,
+    session: AsyncSessionDep,
+    hasher: PasswordHasherDep,
+    body: UpdatePassword,
+    current_user: CurrentUser,
 ) -> Any:
     """
     Update own password.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
-        raise HTTPException(status_code=400, detail="Incorrect password")
-    if body.current_password == body.new_password:
-        raise HTTPException(
-            status_code=400, detail="New password cannot be the same as the current one"
+    try:
+        verified, _ = await hasher.verify_and_update(
+            body.current_password, current_user.hashed_password
         )
-    hashed_password = get_password_hash(body.new_password)
-    current_user.hashed_password = hashed_password
-    session.add(current_user)
-    session.commit()
+        if not verified:
+            raise HTTPException(status_code=400, detail="Incorrect password")
+        if body.current_password == body.new_password:
+            raise HTTPException(
+                status_code=400,
+                detail="New password cannot be the same as the current one",
+            )
+        hashed_password = await hasher.hash(body.new_password)
+    except PasswordHasherOverloaded:
+        raise hasher_overloaded()
+    db_user = await session.get(User, current_user.id)
+    db_user.hashed_password = hashed_password
+    session.add(db_user)
+    await session.commit()
+    user_cache.invalidate(current_user.id)
     return Message(message="Password updated successfully")
 
 
@@ -111,18 +154,26 @@ def read_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
 
 
 @router.post("/signup", response_model=UserOut)
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(
+    session: AsyncSessionDep, hasher: PasswordHasherDep, user_in: UserRegister
+) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
+    try:
+        user = await crud.create_user(
+            session=session, user_create=user_create, hasher=hasher
+        )
+    except PasswordHasherOverloaded:
+        raise hasher_overloaded()
+    row_counts.invalidate("user")
     return user
 
 
@@ -149,35 +200,45 @@ def read_user_by_id(
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserOut,
 )
-def update_user(
+async def update_user(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
+    hasher: PasswordHasherDep,
     user_id: int,
     user_in: UserUpdate,
 ) -> Any:
     """
     Update a user.
     """
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email(session=session, email=user_in.email)
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    try:
+        db_user = await crud.update_user(
+            session=session, db_user=db_user, user_in=user_in, hasher=hasher
+        )
+    except PasswordHasherOverloaded:
+        raise hasher_overloaded()
+    user_cache.invalidate(user_id)
     return db_user
 
 
 @router.delete("/{user_id}")
 def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: int
+    session: SessionDep,
+    current_user: CurrentUser,
+    rebuild_worker: RebuildWorkerDep,
+    user_id: int,
 ) -> Message:
     """
     Delete a user.
@@ -194,8 +255,13 @@ def delete_user(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
 
+    item_ids = session.exec(select(Item.id).where(col(Item.owner_id) == user_id)).all()
     statement = delete(Item).where(col(Item.owner_id) == user_id)
     session.exec(statement)  # type: ignore
     session.delete(user)
     session.commit()
+    user_cache.invalidate(user_id)
+    row_counts.invalidate("user", "item")
+    # The bulk delete bypasses delete_item, drop its movies from recommendations too
+    rebuild_worker.remove_items(item_ids)
     return Message(message="User deleted successfully")
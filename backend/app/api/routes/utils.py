@@ -0,0 +1,21 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_active_superuser
+from app.core.db import async_pool_metrics, pool_metrics
+from app.models import PoolStats
+
+router = APIRouter()
+
+
+@router.get(
+    "/db-pools",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=list[PoolStats],
+)
+def read_db_pools() -> Any:
+    """
+    Get occupancy, checkout waits and connection churn of the database pools.
+    """
+    return [pool_metrics.stats(), async_pool_metrics.stats()]
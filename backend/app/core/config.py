@@ -1,4 +1,5 @@
 import secrets
+from typing import Literal
 
 from pydantic import AnyUrl, PostgresDsn, computed_field
 from pydantic_core import MultiHostUrl
@@ -13,15 +14,74 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Authenticated users cached per token, so most requests skip the user query.
+    # Changes made through another process are seen after the TTL
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    # Cost of new password hashes, stored hashes with fewer rounds are replaced on login
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    # Threads hashing and verifying passwords, and hash requests allowed to wait
+    # for them. Logins and signups beyond that are rejected with 503 right away
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Lifetime of the cached table counts returned with item and user listings
+    ROW_COUNT_TTL_SECONDS: float = 60.0
     BACKEND_CORS_ORIGINS: list[AnyUrl] | str = [
         "http://localhost:5173",
     ]
 
+    # Share of tokens unknown to the recommender vocabulary, relative to its size,
+    # that incremental item updates may add before a full rebuild is triggered
+    RECOMMENDER_MAX_VOCABULARY_DRIFT: float = 0.01
+    # Quiet period after the last write before a requested rebuild starts, or
+    # before incremental updates are saved for restarts and other workers
+    RECOMMENDER_REBUILD_DEBOUNCE_SECONDS: float = 5.0
+    # Longest a rebuild or save waits after its first request, even if writes never quiet down
+    RECOMMENDER_REBUILD_MAX_DELAY_SECONDS: float = 60.0
+    # Interval of checks whether another worker saved a newer recommender version
+    RECOMMENDER_SYNC_INTERVAL_SECONDS: float = 10.0
+    # Recommendation and title lookup results cached per normalized input
+    RECOMMENDER_CACHE_SIZE: int = 1024
+    RECOMMENDER_CACHE_TTL_SECONDS: float = 300.0
+    # Threads running CPU-bound recommender work off the event loop
+    RECOMMENDER_WORKER_THREADS: int = 4
+    # Full rebuilds score blocks of rows in this many processes. Peak memory of
+    # a worker is about block size * catalog size * 4 bytes
+    RECOMMENDER_BUILD_WORKERS: int = 1
+    RECOMMENDER_BUILD_BLOCK_SIZE: int = 1024
+    # "approximate" only scores movies sharing a random projection bucket instead
+    # of every pair. Check its recall with benchmarks.bench_approximate_neighbors
+    RECOMMENDER_NEIGHBOR_MODE: Literal["exact", "approximate"] = "exact"
+    RECOMMENDER_ANN_TABLES: int = 32
+    RECOMMENDER_ANN_BITS: int = 8
+    # Weight of every movie field in the feature vectors, and whether term counts
+    # are scaled by inverse document frequency. Changing them triggers a rebuild
+    RECOMMENDER_FIELD_WEIGHTS: dict[str, float] = {
+        "franchise": 1.0,
+        "director": 2.0,
+        "top_actors": 1.0,
+        "genres": 1.0,
+        "keywords": 1.0,
+    }
+    RECOMMENDER_USE_IDF: bool = True
+
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "7alAmbD0l"
     POSTGRES_DB: str = "app"
+    # Connection pool of every app engine, the sync and the async one. At most
+    # pool size + max overflow connections are open per engine and process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds a request waits for a free connection before failing
+    DB_POOL_TIMEOUT: float = 30.0
+    # Connections older than this many seconds are replaced, -1 keeps them
+    DB_POOL_RECYCLE: int = 1800
+    # Test connections on checkout, so ones dropped by the server are replaced
+    DB_POOL_PRE_PING: bool = True
+    # Server-side limit of every statement in milliseconds, 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = 0
 
     @computed_field  # type: ignore[misc]
     @property
@@ -1,6 +1,44 @@
+from sqlalchemy import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine
 
 from app.core.config import settings
+from app.core.pool_metrics import PoolMetrics, instrumented_pool_class
 
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+def engine_options(pool_class, metrics):
+    """
+    Summary:
+        Pool and connection options of the app engines, from the settings.
+    Parameters:
+        pool_class (type[Pool]): Pool class of the engine, instrumented for the metrics.
+        metrics (PoolMetrics): Metrics of the engine's pool.
+    """
+    options = {
+        "poolclass": instrumented_pool_class(pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        }
+    return options
+
+
+pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI), **engine_options(QueuePool, pool_metrics)
+)
+# psycopg serves both engines, the async one is used by the async routes
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    **engine_options(AsyncAdaptedQueuePool, async_pool_metrics),
+)
+pool_metrics.attach(engine)
+async_pool_metrics.attach(async_engine.sync_engine)
@@ -0,0 +1,159 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond lookups to full rebuilds
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+REBUILD_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Histogram:
+    """
+    Summary:
+        Cumulative histogram of durations in seconds, exported in the Prometheus
+        text format. Every combination of label values is a separate series.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Parameters:
+            name (str): Metric name, ending in the unit, e.g. "_seconds".
+            documentation (str): Help text of the metric.
+            labelnames (tuple[str]): Names of the labels every observation is given.
+            buckets (tuple[float]): Sorted upper bounds of the buckets, +Inf is added.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Summary:
+            Records one duration in seconds.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Bucket counts, then sum and count of all observations
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Summary:
+            Records the duration of the with block, also when it raises.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self):
+        """
+        Summary:
+            Returns the lines of the histogram in the Prometheus text format.
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = sorted(
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self.series.items()
+            )
+        for key, counts, total, count in series:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels([*labels, ("le", format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Summary:
+        Metrics of the process, rendered together for the /metrics endpoint.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, *args, **kwargs):
+        """
+        Summary:
+            Creates a Histogram, see its parameters, and registers it.
+        """
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Summary:
+            Returns all metrics in the Prometheus text exposition format.
+        """
+        return "".join(f"{line}\n" for metric in self.metrics for line in metric.render())
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route template.",
+    labelnames=("method", "route", "status"),
+)
+title_match_time = registry.histogram(
+    "recommender_title_match_seconds",
+    "Time to match input titles to catalog rows.",
+)
+similarity_load_time = registry.histogram(
+    "recommender_similarity_load_seconds",
+    "Time to gather the stored neighbors and scores of the matched rows.",
+)
+ranking_time = registry.histogram(
+    "recommender_ranking_seconds",
+    "Time to rank the neighbors of the matched rows or score free-form attributes.",
+)
+item_fetch_time = registry.histogram(
+    "recommender_item_fetch_seconds",
+    "Time to fetch the recommended items from the database.",
+    labelnames=("route",),
+)
+rebuild_time = registry.histogram(
+    "recommender_rebuild_seconds",
+    "Duration of full recommender rebuilds.",
+    labelnames=("outcome",),
+    buckets=REBUILD_BUCKETS,
+)
@@ -0,0 +1,106 @@
+import base64
+import binascii
+import json
+import threading
+import time
+
+from app.core.config import settings
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Summary:
+        Opaque cursor pointing after the row with the given id.
+    """
+    payload = json.dumps({"after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Summary:
+        Returns the id of the last row of the previous page.
+    Raises:
+        ValueError: The cursor wasn't produced by encode_cursor.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(payload)["after"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return last_id
+
+
+def next_cursor(rows, limit) -> str | None:
+    """
+    Summary:
+        Cursor of the page after the given rows, None if they were the last ones.
+    """
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1].id)
+
+
+class RowCounts:
+    """
+    Summary:
+        Per-process cache of table row counts, so listings don't count the whole
+        table for every page. Writes through the API invalidate the count of their
+        table, writes of other processes are seen once the TTL expired.
+        Every invalidation bumps the generation of the table, and counts queried
+        before it are not stored, so a count racing a write is never cached.
+    """
+
+    def __init__(self, ttl_seconds=None):
+        """
+        Parameters:
+            ttl_seconds (float): Lifetime of a cached count. Defaults to the configured value.
+        """
+        self.ttl_seconds = settings.ROW_COUNT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.counts = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def generation(self, table: str) -> int:
+        """
+        Summary:
+            Returns the generation to pass to put() for a count queried from now on.
+        """
+        with self.lock:
+            return self.generations.get(table, 0)
+
+    def get(self, table: str) -> int | None:
+        """
+        Summary:
+            Returns the cached count of a table, or None if it's missing or expired.
+        """
+        with self.lock:
+            count, expires_at = self.counts.get(table, (None, None))
+            if count is None or expires_at < time.monotonic():
+                return None
+            return count
+
+    def put(self, table: str, count: int, generation: int) -> None:
+        """
+        Summary:
+            Caches the count of a table, unless the table was written since the
+            given generation was taken.
+        """
+        with self.lock:
+            if generation == self.generations.get(table, 0):
+                self.counts[table] = (count, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, *tables: str) -> None:
+        """
+        Summary:
+            Drops the cached counts of tables after a write to them.
+        """
+        with self.lock:
+            for table in tables:
+                self.counts.pop(table, None)
+                self.generations[table] = self.generations.get(table, 0) + 1
+
+
+row_counts = RowCounts()
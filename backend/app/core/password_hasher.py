@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+
+
+class PasswordHasherOverloaded(Exception):
+    """
+    Raised when more password operations wait for the hasher than it accepts.
+    """
+
+
+class OperationTimings:
+    """
+    Summary:
+        Counters and timings of one kind of password operation. Wait is the time
+        spent queued for a hasher thread, run is the time spent hashing.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    def record(self, wait_seconds, run_seconds):
+        self.count += 1
+        self.wait_seconds += wait_seconds
+        self.run_seconds += run_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        self.max_run_seconds = max(self.max_run_seconds, run_seconds)
+
+    def stats(self):
+        count = max(self.count, 1)
+        return {
+            "count": self.count,
+            "rejected": self.rejected,
+            "mean_wait_ms": self.wait_seconds / count * 1000,
+            "mean_run_ms": self.run_seconds / count * 1000,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "max_run_ms": self.max_run_seconds * 1000,
+        }
+
+
+class PasswordHasher:
+    """
+    Summary:
+        Runs bcrypt hashing and verification in its own small thread pool, so a
+        burst of logins or signups neither blocks the event loop nor takes the
+        threads serving other requests. Operations beyond the running ones and
+        the allowed queue depth are rejected right away instead of piling up.
+    """
+
+    OPERATIONS = ("hash", "verify")
+
+    def __init__(self, max_workers=None, max_pending=None):
+        """
+        Parameters:
+            max_workers (int): Threads hashing passwords. Defaults to the configured value.
+            max_pending (int): Operations allowed to wait for a thread. Defaults to the configured value.
+        """
+        self.max_workers = settings.PASSWORD_HASH_WORKERS if max_workers is None else max_workers
+        self.max_pending = (
+            settings.PASSWORD_HASH_MAX_PENDING if max_pending is None else max_pending
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="password-hasher"
+        )
+        self.in_flight = 0
+        self.timings = {operation: OperationTimings() for operation in self.OPERATIONS}
+        self.lock = threading.Lock()
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def stats(self):
+        """
+        Summary:
+            Returns the load of the hasher and the timings of every operation.
+        """
+        with self.lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                **{operation: self.timings[operation].stats() for operation in self.OPERATIONS},
+            }
+
+    async def _run(self, operation, func, *args):
+        with self.lock:
+            if self.in_flight >= self.max_workers + self.max_pending:
+                self.timings[operation].rejected += 1
+                raise PasswordHasherOverloaded(
+                    f"{self.in_flight} password operations are already running or waiting"
+                )
+            self.in_flight += 1
+        submitted_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.perf_counter()
+                with self.lock:
+                    self.timings[operation].record(
+                        started_at - submitted_at, finished_at - started_at
+                    )
+
+        def release(future):
+            # Also called when a request is cancelled while its operation still waits
+            with self.lock:
+                self.in_flight -= 1
+
+        try:
+            future = self.executor.submit(timed)
+        except RuntimeError:
+            # The executor is shut down
+            with self.lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """
+        Summary:
+            Hashes a password in the hasher pool.
+        Raises:
+            PasswordHasherOverloaded: Too many operations are waiting.
+        """
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """
+        Summary:
+            Verifies a password in the hasher pool.
+        Returns:
+            tuple[bool, str | None]: Whether the password matches, and its new hash
+                if the stored one is outdated.
+        Raises:
+            PasswordHasherOverloaded: Too many operations are waiting.
+        """
+        return await self._run("verify", verify_and_update_password, password, hashed_password)
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolMetrics:
+    """
+    Summary:
+        Counters of a connection pool, fed by its events and by the pool class
+        from instrumented_pool_class. Checkout wait is the time a request waited
+        for a connection, including opening a new one. Opened, closed and
+        invalidated connections show the churn of the pool, e.g. from recycling
+        or from overflow connections that are closed on checkin.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.engine = None
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_in_use = 0
+        self.opened = 0
+        self.closed = 0
+        self.invalidated = 0
+        self.lock = threading.Lock()
+
+    def record_wait(self, wait_seconds, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def stats(self):
+        """
+        Summary:
+            Returns the current occupancy of the pool and its counters.
+        """
+        pool = self.engine.pool
+        with self.lock:
+            in_use = pool.checkedout()
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            return {
+                "name": self.name,
+                "size": pool.size(),
+                "in_use": in_use,
+                "idle": pool.checkedin(),
+                # Negative while the pool hasn't opened pool_size connections yet
+                "overflow": max(pool.overflow(), 0),
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "mean_wait_ms": self.wait_seconds / max(self.checkouts, 1) * 1000,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "opened": self.opened,
+                "closed": self.closed,
+                "invalidated": self.invalidated,
+            }
+
+    def _count(self, counter):
+        def listener(*args):
+            with self.lock:
+                setattr(self, counter, getattr(self, counter) + 1)
+
+        return listener
+
+    def _on_checkout(self, *args):
+        with self.lock:
+            self.peak_in_use = max(self.peak_in_use, self.engine.pool.checkedout())
+
+    def attach(self, engine):
+        """
+        Summary:
+            Listens to the events of the pool of an engine. Listeners are kept when
+            the pool is recreated, e.g. by Engine.dispose().
+        Parameters:
+            engine (Engine): Engine to instrument, the sync_engine of an AsyncEngine.
+        """
+        self.engine = engine
+        pool = engine.pool
+        event.listen(pool, "connect", self._count("opened"))
+        event.listen(pool, "close", self._count("closed"))
+        event.listen(pool, "close_detached", self._count("closed"))
+        event.listen(pool, "invalidate", self._count("invalidated"))
+        event.listen(pool, "checkout", self._on_checkout)
+
+
+class CheckoutTimer:
+    """
+    Summary:
+        Pool mixin timing how long every checkout waits for a connection. The pool
+        has no event before a checkout starts waiting, so the wait is timed around
+        the pool's own get.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - started_at, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - started_at)
+        return connection
+
+
+def instrumented_pool_class(pool_class, metrics):
+    """
+    Summary:
+        Subclass of a pool class reporting checkout waits to the given metrics.
+        The metrics are a class attribute, so pools recreated from it keep them.
+    Parameters:
+        pool_class (type[Pool]): Pool class of the engine, e.g. QueuePool.
+        metrics (PoolMetrics): Metrics of the engine's pool.
+    """
+    return type(
+        f"Instrumented{pool_class.__name__}",
+        (CheckoutTimer, pool_class),
+        {"metrics": metrics},
+    )
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Summary:
+        Bounded thread-safe cache with LRU eviction and a TTL. Expired entries
+        are dropped when they're looked up, the least recently used ones when
+        the cache grows above its size limit.
+    """
+
+    def __init__(self, max_size, ttl_seconds):
+        """
+        Parameters:
+            max_size (int): Maximum number of cached entries. 0 disables the cache.
+            ttl_seconds (float): Lifetime of a cached entry.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        """
+        Summary:
+            Returns the size and counters of the cache.
+        """
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def get(self, key):
+        """
+        Summary:
+            Returns the cached value of a key, or None if it's missing or expired.
+        Parameters:
+            key (hashable): Key of the entry.
+        """
+        with self.lock:
+            value, expires_at = self.entries.get(key, (_MISSING, None))
+            if value is not _MISSING and expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                value = _MISSING
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Summary:
+            Caches a value, evicting the least recently used entries above the size limit.
+        Parameters:
+            key (hashable): Key of the entry.
+            value (object): Value to cache.
+        """
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Summary:
+            Drops every entry.
+        Returns:
+            int: Number of dropped entries.
+        """
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            return count
+
+    def remove_where(self, predicate):
+        """
+        Summary:
+            Drops every entry whose key matches a predicate.
+        Parameters:
+            predicate (callable): Called with the key of every entry.
+        Returns:
+            int: Number of dropped entries.
+        """
+        with self.lock:
+            keys = [key for key in self.entries if predicate(key)]
+            for key in keys:
+                del self.entries[key]
+            return len(keys)
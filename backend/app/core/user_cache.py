@@ -0,0 +1,83 @@
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+from app.models import User
+
+
+class UserCache:
+    """
+    Summary:
+        Bounded per-process cache of authenticated users with LRU eviction and
+        a short TTL, so the auth dependency doesn't query the user table on every
+        request. Entries are keyed by user id and token. The routes changing a
+        user invalidate its entries, changes made by other processes are seen
+        once the TTL expired.
+        Cached users are detached copies bound to no session. get() merges a copy
+        into the session of the request without loading it, so the request can
+        modify and commit the user without touching the cached one.
+    """
+
+    def __init__(self, max_size=None, ttl_seconds=None):
+        """
+        Parameters:
+            max_size (int): Maximum number of cached users. Defaults to the configured value.
+            ttl_seconds (float): Lifetime of a cached user. Defaults to the configured value.
+        """
+        self.cache = TTLCache(
+            settings.USER_CACHE_SIZE if max_size is None else max_size,
+            settings.USER_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds,
+        )
+
+    def __len__(self):
+        return len(self.cache)
+
+    def stats(self):
+        """
+        Summary:
+            Returns the size and counters of the cache.
+        """
+        return self.cache.stats()
+
+    def get(self, session: Session, user_id: int, token: str) -> User | None:
+        """
+        Summary:
+            Returns the cached user of a token, attached to the session, or None
+            if it's missing or expired.
+        Parameters:
+            session (Session): Session of the request.
+            user_id (int): Id of the user from the token.
+            token (str): Access token of the request.
+        """
+        user = self.cache.get((user_id, token))
+        if user is None:
+            return None
+        return session.merge(user, load=False)
+
+    def put(self, user: User, token: str) -> None:
+        """
+        Summary:
+            Caches a detached copy of a user loaded from the database, evicting
+            the least recently used users above the size limit.
+        Parameters:
+            user (User): User loaded for the token.
+            token (str): Access token of the request.
+        """
+        if self.cache.max_size <= 0:
+            return
+        cached = User(**user.model_dump())
+        make_transient_to_detached(cached)
+        self.cache.put((user.id, token), cached)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Summary:
+            Drops every cached entry of a user, the next request loads it again.
+        Parameters:
+            user_id (int): Id of the changed or deleted user.
+        """
+        self.cache.remove_where(lambda key: key[0] == user_id)
+
+
+user_cache = UserCache()
@@ -1,53 +1,67 @@
 from typing import Any
 
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.core.password_hasher import PasswordHasher
 from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
 
 
-def create_user(*, session: Session, user_create: UserCreate) -> User:
-    db_obj = User.model_validate(
-        user_create, update={"hashed_password": get_password_hash(user_create.password)}
-    )
-    session.add(db_obj)
+def create_item(*, session: Session, item_in: ItemCreate, owner_id: int) -> Item:
+    db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
+    session.add(db_item)
     session.commit()
-    session.refresh(db_obj)
+    session.refresh(db_item)
+    return db_item
+
+
+# Passwords are hashed and verified in the PasswordHasher pool, never in the
+# thread serving the request
+
+
+async def create_user(
+    *, session: AsyncSession, user_create: UserCreate, hasher: PasswordHasher
+) -> User:
+    hashed_password = await hasher.hash(user_create.password)
+    db_obj = User.model_validate(user_create, update={"hashed_password": hashed_password})
+    session.add(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
     return db_obj
 
 
-def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
+async def update_user(
+    *, session: AsyncSession, db_user: User, user_in: UserUpdate, hasher: PasswordHasher
+) -> Any:
     user_data = user_in.model_dump(exclude_unset=True)
     extra_data = {}
     if "password" in user_data:
-        password = user_data["password"]
-        hashed_password = get_password_hash(password)
-        extra_data["hashed_password"] = hashed_password
+        extra_data["hashed_password"] = await hasher.hash(user_data["password"])
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 
-def get_user_by_email(*, session: Session, email: str) -> User | None:
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
     statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
-    return session_user
+    return (await session.exec(statement)).first()
 
 
-def authenticate(*, session: Session, email: str, password: str) -> User | None:
-    db_user = get_user_by_email(session=session, email=email)
+async def authenticate(
+    *, session: AsyncSession, email: str, password: str, hasher: PasswordHasher
+) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = await hasher.verify_and_update(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # The stored hash has outdated parameters, replace it while the password is known
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
     return db_user
-
-
-def create_item(*, session: Session, item_in: ItemCreate, owner_id: int) -> Item:
-    db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
-    session.add(db_item)
-    session.commit()
-    session.refresh(db_item)
-    return db_item
@@ -1,19 +1,53 @@
-from fastapi import FastAPI
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.core.config import settings
+from app.core.metrics import registry, request_latency
+from app.core.password_hasher import PasswordHasher
+from app.recommender.engine import RecommenderEngine
+from app.recommender.rebuild import RebuildWorker
+from app.recommender.result_cache import ResultCache
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the recommender once, every request is served from memory afterwards
+    app.state.recommender = RecommenderEngine.load()
+    # Full rebuilds run in the background and swap the engine when done
+    app.state.rebuild_worker = RebuildWorker(
+        get_engine=lambda: app.state.recommender,
+        set_engine=lambda rec_engine: setattr(app.state, "recommender", rec_engine),
+    )
+    app.state.rebuild_worker.start()
+    app.state.result_cache = ResultCache()
+    # Fuzzy matching and ranking run here, so they never block the event loop
+    app.state.recommender_pool = ThreadPoolExecutor(
+        max_workers=settings.RECOMMENDER_WORKER_THREADS, thread_name_prefix="recommender"
+    )
+    # bcrypt runs in its own bounded pool, so login bursts don't starve other requests
+    app.state.password_hasher = PasswordHasher()
+    yield
+    app.state.password_hasher.shutdown()
+    app.state.recommender_pool.shutdown()
+    app.state.rebuild_worker.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -29,3 +63,47 @@ if settings.BACKEND_CORS_ORIGINS:
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+def route_template(request: Request) -> str:
+    """
+    Path template of the matched route, e.g. /api/v1/items/{id}, so ids and
+    titles don't create a series per value. Depending on the FastAPI version,
+    the path of a route of an included router is relative to that router, so
+    the prefixes are taken from the request path in front of what the route matched.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = request.scope["path"]
+    for start in (i for i, char in enumerate(path) if char == "/"):
+        if route.path_regex.match(path[start:]):
+            return path[:start] + route.path
+    return route.path
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_latency.observe(
+            time.perf_counter() - started_at,
+            method=request.method,
+            route=route_template(request),
+            status=status,
+        )
+
+
+@app.get("/metrics", tags=["metrics"], include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """
+    Latency histograms of the routes and recommender stages, in the Prometheus text format.
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
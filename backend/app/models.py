@@ -1,3 +1,6 @@
+from datetime import datetime
+
+from pydantic import model_validator
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -51,6 +54,7 @@ class UserOut(UserBase):
 class UsersOut(SQLModel):
     data: list[UserOut]
     count: int
+    next_cursor: str | None = None
 
 
 # Shared properties
@@ -117,6 +121,111 @@ class ItemOut(ItemBase):
 class ItemsOut(SQLModel):
     data: list[ItemOut]
     count: int
+    next_cursor: str | None = None
+
+
+# One query of a batch recommendation request, by title or by item id
+class RecommendationQuery(SQLModel):
+    title: str | None = None
+    item_id: int | None = None
+    k: int = Field(default=3, ge=1, le=50)
+
+    @model_validator(mode="after")
+    def check_title_or_item_id(self) -> "RecommendationQuery":
+        if (self.title is None) == (self.item_id is None):
+            raise ValueError("Exactly one of title and item_id must be given")
+        return self
+
+
+class RecommendationsBatchIn(SQLModel):
+    queries: list[RecommendationQuery] = Field(min_length=1, max_length=1000)
+
+
+# Free-form movie attributes to recommend similar movies for
+class RecommendationAttributesIn(SQLModel):
+    franchise: str | None = None
+    director: str | None = None
+    top_actors: str | None = None
+    genres: str | None = None
+    keywords: str | None = None
+    k: int = Field(default=3, ge=1, le=50)
+
+    @model_validator(mode="after")
+    def check_any_attribute(self) -> "RecommendationAttributesIn":
+        if not any(self.model_dump(exclude={"k"}).values()):
+            raise ValueError("At least one attribute must be given")
+        return self
+
+
+# Recommendations for one query, item is the movie the query resolved to
+class RecommendationOut(SQLModel):
+    item: ItemOut | None
+    data: list[ItemOut]
+    count: int
+
+
+class RecommendationsBatchOut(SQLModel):
+    data: list[RecommendationOut]
+    count: int
+
+
+# Counters of the recommender result cache
+class ResultCacheStats(SQLModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+
+# State of the served recommender index
+class RecommenderStatus(SQLModel):
+    version: int
+    built_at: datetime
+    item_count: int
+    incremental_updates: int
+    rebuild_pending: bool
+    rebuilding: bool
+    last_error: str | None = None
+    cache: ResultCacheStats
+
+
+# Timings of one kind of password operation
+class PasswordOperationStats(SQLModel):
+    count: int
+    rejected: int
+    mean_wait_ms: float
+    mean_run_ms: float
+    max_wait_ms: float
+    max_run_ms: float
+
+
+# Load and timings of the password hasher pool
+class PasswordHasherStats(SQLModel):
+    max_workers: int
+    max_pending: int
+    in_flight: int
+    hash: PasswordOperationStats
+    verify: PasswordOperationStats
+
+
+# Occupancy and counters of a database connection pool
+class PoolStats(SQLModel):
+    name: str
+    size: int
+    in_use: int
+    idle: int
+    overflow: int
+    peak_in_use: int
+    checkouts: int
+    checkout_timeouts: int
+    mean_wait_ms: float
+    max_wait_ms: float
+    opened: int
+    closed: int
+    invalidated: int
 
 
 # Generic message
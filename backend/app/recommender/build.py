@@ -0,0 +1,23 @@
+"""
+Builds the recommender artifacts from the current item table, so the app
+can serve recommendations right after startup.
+
+Run from the 'backend' directory:
+    python -m app.recommender.build
+"""
+import logging
+
+from app.recommender.utils.calc_cosine_sim import calc_cosine_sim
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logger.info("Building recommender artifacts")
+    neighbor_ids, _ = calc_cosine_sim(force_calculation=True)
+    logger.info("Recommender artifacts built for %d movies", len(neighbor_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from app.core.config import settings
+from app.recommender.utils.artifacts import (
+    ARTIFACTS_PATH,
+    is_stale,
+    load_artifacts,
+    save_artifacts,
+    sparse_arrays,
+    sparse_matrix,
+    table_source,
+)
+from app.recommender.utils.calc_cosine_sim import calc_cosine_sim
+from app.recommender.utils.catalog import catalog_loader, row_hashes
+from app.recommender.utils.feature_engine import FeatureEngine
+from app.recommender.utils.title_index import TitleIndex
+from app.recommender.utils.top_n import top_n
+
+logger = logging.getLogger(__name__)
+
+
+class RecommenderEngine:
+    """
+    Summary:
+        Long-lived in-memory state of the recommender. Holds the movie titles
+        with their fuzzy lookup index, the mapping between database ids and
+        neighbor index rows, and the neighbor index itself, so recommendation
+        requests don't touch the database or the filesystem.
+        Rows follow the item id map persisted with the neighbor index, never the
+        order the item table happens to be read in.
+        The feature matrix persisted with the neighbor index is kept as well, so
+        any new or ad-hoc movie can be vectorized with the stored vocabulary and
+        scored against the whole catalog with a single sparse product.
+        Item changes are applied incrementally: only the changed movie is
+        vectorized and only the neighbor lists it enters or leaves are updated.
+        Deleted movies keep their row until the next full rebuild.
+        The content hash of every row is kept up to date with the changes, so
+        saved engines can be told apart from the item table they were taken from.
+        Updates hold the lock and replace the catalog and the title index with
+        changed copies, so readers take them, and gather neighbor lists, under the
+        lock and then work on a consistent state without it.
+    """
+
+    def __init__(
+        self,
+        df,
+        neighbor_ids,
+        neighbor_scores,
+        item_ids,
+        feature_engine,
+        manifest=None,
+        features=None,
+        hashes=None,
+    ):
+        """
+        Parameters:
+            df (DataFrame): Movie data with exactly the movies of the neighbor index, in any order.
+            neighbor_ids (ndarray): Neighbor row positions for every movie, -1 pads
+                lists with fewer than K neighbors.
+            neighbor_scores (ndarray): Cosine similarity scores of the neighbors.
+            item_ids (ndarray): Database id of the movie of every neighbor index row.
+            feature_engine (FeatureEngine): Fitted feature engine the neighbor index was built with.
+            manifest (dict): Manifest of the artifact the neighbor index was loaded from.
+            features (csr_matrix): Normalized feature matrix of the neighbor index rows.
+                Recomputed from the movie data if omitted.
+            hashes (ndarray): Content hash of the movie of every row, see row_hashes.
+                Recomputed from the movie data if omitted.
+        """
+        # Put the movies in the row order of the neighbor index, whatever order
+        # the table was read in
+        df = df.set_index("id").loc[item_ids].reset_index()
+        self.catalog = df[["id", "title", "release_year"]].copy()
+        self.title_index = TitleIndex(self.catalog["title"].tolist())
+        self.item_ids = np.asarray(item_ids)
+        self.id_to_row = {item_id: row for row, item_id in enumerate(self.item_ids.tolist())}
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+        self.feature_engine = feature_engine
+        self.features = self.vectorize(df) if features is None else features
+        self.row_hashes = row_hashes(df) if hashes is None else hashes
+        self.deleted = np.zeros(len(self.item_ids), dtype=bool)
+        self.unseen_tokens = set()
+        # The version identifies the neighbor index build, it changes with every rebuild
+        if manifest is None:
+            self.built_at = datetime.now(timezone.utc)
+            self.version = int(self.built_at.timestamp() * 1_000_000)
+        else:
+            self.built_at = datetime.fromisoformat(manifest["built_at"])
+            self.version = manifest["version"]
+        self.incremental_updates = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, force_calculation=False, path=ARTIFACTS_PATH, catalog=None, rebuild=True):
+        """
+        Summary:
+            Takes the shared snapshot of the item table and opens the memory-mapped artifacts of the
+            neighbor index and of the feature matrix. They are recalculated if
+            they're missing, corrupt, were built from a different state of the
+            item table, including changed item contents, or with a different feature config.
+        Parameters:
+            force_calculation (bool): Forcefully re-read the item table and recalculate
+                the neighbor index.
+            path (str): Directory holding the artifact versions.
+            catalog (CatalogLoader): Loader of the item table. Defaults to the shared snapshot.
+            rebuild (bool): Recalculate unusable artifacts. If False, None is returned instead.
+        Returns:
+            RecommenderEngine: Engine ready to serve recommendations.
+        """
+        df = (catalog or catalog_loader).load(force=force_calculation)
+        artifacts = None
+        if not force_calculation:
+            try:
+                artifacts = load_artifacts(path)
+            except (FileNotFoundError, ValueError) as e:
+                logger.warning("Stored neighbor index can't be used: %r", e)
+            if artifacts is not None and (
+                is_stale(artifacts[0], table_source(df["id"].to_numpy(), row_hashes(df)))
+                or not np.array_equal(
+                    np.sort(artifacts[1]["item_ids"]), np.sort(df["id"].to_numpy())
+                )
+                or artifacts[0]["feature_config"] != FeatureEngine().config
+            ):
+                logger.info("Stored neighbor index was built from a different catalog")
+                artifacts = None
+        if artifacts is None:
+            if not rebuild:
+                return None
+            calc_cosine_sim(df, path=path, force_calculation=True)
+            artifacts = load_artifacts(path)
+        manifest, arrays, vocabulary = artifacts
+        return cls(
+            df,
+            arrays["neighbor_ids"],
+            arrays["neighbor_scores"],
+            arrays["item_ids"],
+            FeatureEngine().load_state(vocabulary, arrays["idf"]),
+            manifest,
+            features=sparse_matrix(arrays, "features", len(arrays["idf"])),
+            hashes=arrays["row_hashes"],
+        )
+
+    def save(self, path=ARTIFACTS_PATH):
+        """
+        Summary:
+            Writes the current state of the engine, incremental updates included,
+            as a new artifact version and makes it current, so restarts and other
+            workers serve it too. Deleted movies are left out and the neighbor
+            lists that still hold them are padded instead.
+        Parameters:
+            path (str): Directory holding the artifact versions.
+        Returns:
+            dict: Manifest of the written version.
+        """
+        with self.lock:
+            keep = np.flatnonzero(~self.deleted)
+            # New row of every row, the extra last entry maps the -1 padding to itself
+            new_rows = np.full(len(self.item_ids) + 1, -1, dtype=np.int32)
+            new_rows[keep] = np.arange(keep.size, dtype=np.int32)
+            neighbor_ids = new_rows[self.neighbor_ids[keep]]
+            neighbor_scores = np.where(neighbor_ids < 0, -np.inf, self.neighbor_scores[keep])
+            item_ids = self.item_ids[keep].astype(np.int64)
+            hashes = self.row_hashes[keep]
+            features = self.features[keep]
+        # Move the padding behind the remaining neighbors. Rows keep their relative
+        # order, so ties stay ordered by row position
+        order = np.lexsort((neighbor_ids, -neighbor_scores), axis=1)
+        return save_artifacts(
+            {
+                "neighbor_ids": np.take_along_axis(neighbor_ids, order, axis=1),
+                "neighbor_scores": np.take_along_axis(neighbor_scores, order, axis=1).astype(
+                    np.float32
+                ),
+                "item_ids": item_ids,
+                "row_hashes": hashes,
+                "idf": self.feature_engine.idf,
+                **sparse_arrays("features", features),
+            },
+            self.feature_engine.vocabulary,
+            table_source(item_ids, hashes),
+            path,
+            feature_config=self.feature_engine.config,
+        )
+
+    @property
+    def generation(self):
+        """
+        Summary:
+            Changes whenever results of the engine may change: on every rebuild
+            and on every incremental update.
+        """
+        return self.version, self.incremental_updates
+
+    def content_hash(self):
+        """
+        Summary:
+            Content hash of the movies the engine serves, as in table_source.
+        """
+        with self.lock:
+            return int(np.sum(self.row_hashes, dtype=np.uint64))
+
+    def lookup_state(self):
+        """
+        Summary:
+            Returns the catalog and the title index of the same engine state, for find_movie.
+        """
+        with self.lock:
+            return self.catalog, self.title_index
+
+    def row_of(self, item_id):
+        """
+        Summary:
+            Returns the neighbor index row of a movie, or None if the movie is unknown.
+        """
+        return self.id_to_row.get(item_id)
+
+    def vectorize(self, df):
+        """
+        Summary:
+            Vectorizes movies with the feature engine of the neighbor index, without refitting.
+        Parameters:
+            df (DataFrame): Movie data with franchise, director, top_actors, genres and keywords columns.
+        Returns:
+            csr_matrix: Normalized feature rows, one per movie.
+        """
+        return self.feature_engine.transform(df)
+
+    def score(self, vector):
+        """
+        Summary:
+            Scores a feature row against every movie of the catalog.
+        Parameters:
+            vector (csr_matrix): Normalized feature row, as returned by vectorize.
+        Returns:
+            ndarray: Cosine similarity to the movie of every row. Deleted movies score -inf.
+            Callers hold the lock, as updates may change the features meanwhile.
+        """
+        sims = (self.features @ vector.T).toarray().ravel()
+        sims[self.deleted] = -np.inf
+        return sims
+
+    def most_similar(self, vector, k, exclude=None):
+        """
+        Summary:
+            Finds the movies most similar to a feature row, which needn't belong
+            to any movie of the catalog.
+        Parameters:
+            vector (csr_matrix): Normalized feature row, as returned by vectorize.
+            k (int): Number of movies to return.
+            exclude (int): Row never returned, e.g. the row of the vector itself.
+        Returns:
+            tuple[ndarray, ndarray]: Rows of the most similar movies and their cosine
+            similarity scores, best match first. Deleted movies are never returned.
+        """
+        with self.lock:
+            sims = self.score(vector)
+        if exclude is not None:
+            sims[exclude] = -np.inf
+        rows, scores = top_n(sims, k)
+        keep = np.isfinite(scores)
+        return rows[keep], scores[keep]
+
+    def vocabulary_drift(self):
+        """
+        Summary:
+            Share of tokens seen in incremental updates that are missing from the vocabulary.
+        """
+        return len(self.unseen_tokens) / max(self.feature_engine.n_features, 1)
+
+    def needs_rebuild(self):
+        """
+        Summary:
+            Whether incremental updates ignored too many new tokens and a full rebuild is due.
+        """
+        return self.vocabulary_drift() > settings.RECOMMENDER_MAX_VOCABULARY_DRIFT
+
+    def upsert_item(self, item):
+        """
+        Summary:
+            Adds a new movie or applies changes of an existing one.
+        Parameters:
+            item (Item): Created or updated movie.
+        """
+        record = item.model_dump()
+        vector = self.vectorize(pd.DataFrame([record]))
+        item_hash = row_hashes(pd.DataFrame([record]))[0]
+        with self.lock:
+            self.unseen_tokens.update(self.feature_engine.unseen_tokens(record))
+            catalog = self.catalog.copy()
+            title_index = self.title_index.copy()
+            row = self.id_to_row.get(item.id)
+            if row is None:
+                row = len(self.item_ids)
+                title_index.add(item.title)
+                self.item_ids = np.append(self.item_ids, item.id)
+                self.id_to_row[item.id] = row
+                self.features = sparse.vstack([self.features, vector], format="csr")
+                self.deleted = np.append(self.deleted, False)
+                self.row_hashes = np.append(self.row_hashes, item_hash)
+                k = self.neighbor_ids.shape[1]
+                self.neighbor_ids = np.vstack(
+                    [self.neighbor_ids, np.full((1, k), -1, dtype=self.neighbor_ids.dtype)]
+                )
+                self.neighbor_scores = np.vstack(
+                    [self.neighbor_scores, np.full((1, k), -np.inf, dtype=np.float32)]
+                )
+            else:
+                title_index.replace(row, item.title)
+                self.features = sparse.vstack(
+                    [self.features[:row], vector, self.features[row + 1 :]], format="csr"
+                )
+                self.row_hashes[row] = item_hash
+            catalog.loc[row] = [item.id, item.title, item.release_year]
+            self.catalog, self.title_index = catalog, title_index
+            self._update_neighbors(row)
+            self.incremental_updates += 1
+
+    def remove_item(self, item_id):
+        """
+        Summary:
+            Removes a deleted movie from recommendations and from the neighbor lists of other movies.
+        Parameters:
+            item_id (int): Database id of the deleted movie.
+        """
+        with self.lock:
+            row = self.id_to_row.pop(item_id, None)
+            if row is None:
+                return
+            self.deleted[row] = True
+            self.row_hashes[row] = 0
+            title_index = self.title_index.copy()
+            title_index.remove(row)
+            self.title_index = title_index
+            self._update_neighbors(row)
+            self.incremental_updates += 1
+
+    def remove_items(self, item_ids):
+        """
+        Summary:
+            Removes many deleted movies at once, e.g. all movies of a deleted user.
+            They leave recommendations right away, but the neighbor lists holding
+            them aren't recomputed and are one neighbor shorter per removed movie
+            until the next full rebuild.
+        Parameters:
+            item_ids (list[int]): Database ids of the deleted movies.
+        Returns:
+            int: Number of removed movies that were in the engine.
+        """
+        with self.lock:
+            rows = [
+                self.id_to_row.pop(item_id) for item_id in item_ids if item_id in self.id_to_row
+            ]
+            if not rows:
+                return 0
+            self.deleted[rows] = True
+            self.row_hashes[rows] = 0
+            title_index = self.title_index.copy()
+            for row in rows:
+                title_index.remove(row)
+            self.title_index = title_index
+            self.incremental_updates += 1
+            return len(rows)
+
+    def _update_neighbors(self, row):
+        """
+        Summary:
+            Recomputes the neighbors of a changed movie and patches the neighbor
+            lists of other movies it enters or leaves. Lists that lose the movie
+            are recomputed, as their next best neighbor isn't stored.
+        """
+        k = self.neighbor_ids.shape[1]
+        if k == 0:
+            return
+        # Similarity of the changed movie to every other movie. A deleted movie
+        # is no one's neighbor anymore
+        if self.deleted[row]:
+            sims = np.full(len(self.item_ids), -np.inf, dtype=np.float32)
+        else:
+            sims = self.score(self.features[row])
+            sims[row] = -np.inf
+        kth_scores = self.neighbor_scores[:, -1]
+        others = ~self.deleted
+        others[row] = False
+        contains = others & (self.neighbor_ids == row).any(axis=1)
+        # Rows that may now rank the movie among their top-K. Padded lists have a
+        # K-th score of -inf, which only an actual similarity may replace
+        enters = np.flatnonzero(others & ~contains & np.isfinite(sims) & (sims >= kth_scores))
+        if enters.size:
+            ids = np.hstack([self.neighbor_ids[enters], np.full((enters.size, 1), row)])
+            scores = np.hstack([self.neighbor_scores[enters], sims[enters, None]])
+            self._store_sorted(enters, ids, scores)
+        # Rows that keep the movie, as it still beats everything outside of their list
+        stays = np.flatnonzero(contains & (sims > kth_scores))
+        if stays.size:
+            ids = self.neighbor_ids[stays]
+            scores = np.where(ids == row, sims[stays, None], self.neighbor_scores[stays])
+            self._store_sorted(stays, ids, scores)
+        recompute = np.flatnonzero(contains & ~(sims > kth_scores))
+        if not self.deleted[row]:
+            recompute = np.append(recompute, row)
+        if recompute.size:
+            block = (self.features[recompute] @ self.features.T).toarray()
+            block[:, self.deleted] = -np.inf
+            block[np.arange(recompute.size), recompute] = -np.inf
+            ids, scores = top_n(block, k)
+            # Fewer than K movies left to rank, pad like the full build does
+            ids[np.isinf(scores)] = -1
+            self.neighbor_ids[recompute], self.neighbor_scores[recompute] = ids, scores
+
+    def _store_sorted(self, rows, ids, scores):
+        """
+        Summary:
+            Keeps the best K of the candidate neighbors of the given rows,
+            ordered like the full build: by score, then by row position.
+        """
+        k = self.neighbor_ids.shape[1]
+        order = np.lexsort((ids, -scores), axis=1)[:, :k]
+        self.neighbor_ids[rows] = np.take_along_axis(ids, order, axis=1)
+        self.neighbor_scores[rows] = np.take_along_axis(scores, order, axis=1)
@@ -0,0 +1,311 @@
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.core.metrics import rebuild_time
+from app.models import Item
+from app.recommender.engine import RecommenderEngine
+from app.recommender.utils.artifacts import ARTIFACTS_PATH, current_manifest, table_source
+from app.recommender.utils.catalog import catalog_loader, row_hashes
+
+logger = logging.getLogger(__name__)
+
+
+def postponed(requested_at):
+    """
+    Summary:
+        Adds a request to the first and last request times of a pending task.
+    Parameters:
+        requested_at (tuple[float, float] | None): Times of the pending requests, None if
+            there are none.
+    Returns:
+        tuple[float, float]: Times of the first and of the last request.
+    """
+    now = time.monotonic()
+    return (now, now) if requested_at is None else (requested_at[0], now)
+
+
+class RebuildWorker:
+    """
+    Summary:
+        Rebuilds the recommender in a background thread, so item writes never
+        wait for a full neighbor index calculation. Bursts of rebuild requests
+        are debounced into a single rebuild, which still starts once the first
+        of them waited for the maximum delay, so steady writes can't postpone it
+        forever. The new index is written under a
+        temporary name and renamed into place, then the fresh engine replaces
+        the served one in a single assignment.
+        Item changes applied while a new engine is loaded are journaled and
+        replayed on it before it's swapped in, as it may have been read from the
+        item table or the artifacts before they were committed.
+        Incremental updates are saved as a new artifact version once writes
+        quiet down, so restarts don't serve outdated features and neighbors.
+        The thread also polls the current artifact version: a version written
+        by another worker is loaded if it matches the item table. If it doesn't,
+        this worker's engine is saved if it does match, otherwise both miss
+        changes and a rebuild is requested.
+    """
+
+    def __init__(
+        self,
+        get_engine,
+        set_engine,
+        debounce_seconds=None,
+        path=ARTIFACTS_PATH,
+        max_delay_seconds=None,
+    ):
+        """
+        Parameters:
+            get_engine (callable): Returns the served RecommenderEngine.
+            set_engine (callable): Called with the rebuilt RecommenderEngine to swap it in.
+            debounce_seconds (float): Quiet period after the last rebuild or save request
+                before it starts. Defaults to the configured value.
+            path (str): Directory holding the artifact versions.
+            max_delay_seconds (float): Longest wait after the first pending rebuild or
+                save request, however often it is repeated. Defaults to the configured value.
+        """
+        if debounce_seconds is None:
+            debounce_seconds = settings.RECOMMENDER_REBUILD_DEBOUNCE_SECONDS
+        if max_delay_seconds is None:
+            max_delay_seconds = settings.RECOMMENDER_REBUILD_MAX_DELAY_SECONDS
+        self.get_engine = get_engine
+        self.set_engine = set_engine
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.sync_seconds = settings.RECOMMENDER_SYNC_INTERVAL_SECONDS
+        self.path = path
+        self.rebuilding = False
+        self.last_error = None
+        # Last artifact version the served engine was loaded from, saved as or
+        # compared with
+        self.artifact_version = None
+        self.journal = []
+        self.journaling = False
+        self.lock = threading.Lock()
+        # Times of the first and of the last pending request
+        self._requested_at = None
+        self._save_requested_at = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def rebuild_pending(self):
+        """
+        Summary:
+            Whether a rebuild was requested and hasn't started yet.
+        """
+        return self._requested_at is not None
+
+    def start(self):
+        self.artifact_version = self.get_engine().version
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="recommender-rebuild", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request_rebuild(self):
+        """
+        Summary:
+            Schedules a rebuild once no further request came in for the debounce period.
+        """
+        with self.lock:
+            self._requested_at = postponed(self._requested_at)
+        self._wakeup.set()
+
+    def request_save(self):
+        """
+        Summary:
+            Schedules saving the served engine once no further request came in
+            for the debounce period.
+        """
+        with self.lock:
+            self._save_requested_at = postponed(self._save_requested_at)
+        self._wakeup.set()
+
+    def upsert_item(self, item):
+        """
+        Summary:
+            Applies a created or updated movie to the served engine and schedules
+            a rebuild if the engine drifted too far from its vocabulary.
+        Parameters:
+            item (Item): Created or updated movie.
+        """
+        with self.lock:
+            # Updates keep the max id and row count, so the snapshot can't tell
+            catalog_loader.invalidate()
+            rec_engine = self.get_engine()
+            rec_engine.upsert_item(item)
+            if self.journaling:
+                self.journal.append(("upsert", Item(**item.model_dump())))
+        if rec_engine.needs_rebuild():
+            self.request_rebuild()
+        self.request_save()
+
+    def remove_item(self, item_id):
+        """
+        Summary:
+            Removes a deleted movie from the served engine.
+        Parameters:
+            item_id (int): Database id of the deleted movie.
+        """
+        with self.lock:
+            catalog_loader.invalidate()
+            self.get_engine().remove_item(item_id)
+            if self.journaling:
+                self.journal.append(("remove", item_id))
+        self.request_save()
+
+    def remove_items(self, item_ids):
+        """
+        Summary:
+            Removes many deleted movies from the served engine at once and schedules
+            a rebuild to refill the neighbor lists they leave.
+        Parameters:
+            item_ids (list[int]): Database ids of the deleted movies.
+        """
+        with self.lock:
+            catalog_loader.invalidate()
+            removed = self.get_engine().remove_items(item_ids)
+            if self.journaling:
+                self.journal.append(("remove_many", list(item_ids)))
+        if removed:
+            self.request_rebuild()
+            self.request_save()
+
+    def _run(self):
+        next_sync_at = time.monotonic() + self.sync_seconds
+        while not self._stop.is_set():
+            with self.lock:
+                due = {
+                    task: min(
+                        requested_at[1] + self.debounce_seconds,
+                        requested_at[0] + self.max_delay_seconds,
+                    )
+                    for task, requested_at in (
+                        (self._rebuild, self._requested_at),
+                        (self._save, self._save_requested_at),
+                    )
+                    if requested_at is not None
+                }
+            due[self._sync] = next_sync_at
+            task = min(due, key=due.get)
+            remaining = due[task] - time.monotonic()
+            if remaining > 0:
+                # New requests wake the thread up, and may push their task back up
+                # to the maximum delay
+                self._wakeup.wait(remaining)
+                self._wakeup.clear()
+                continue
+            if task == self._sync:
+                next_sync_at = time.monotonic() + self.sync_seconds
+            try:
+                task()
+            except Exception:
+                logger.exception("Recommender %s failed", task.__name__.strip("_"))
+
+    def _swap_in(self, load):
+        """
+        Summary:
+            Loads a new engine while journaling item changes, replays them on it and
+            swaps it in.
+        Parameters:
+            load (callable): Returns the new RecommenderEngine, or None to keep the served one.
+        Returns:
+            RecommenderEngine: The swapped in engine, or None.
+        """
+        with self.lock:
+            self.journaling = True
+            self.journal = []
+        try:
+            rec_engine = load()
+            if rec_engine is None:
+                return None
+            with self.lock:
+                for action, value in self.journal:
+                    if action == "upsert":
+                        rec_engine.upsert_item(value)
+                    elif action == "remove":
+                        rec_engine.remove_item(value)
+                    else:
+                        rec_engine.remove_items(value)
+                self.set_engine(rec_engine)
+                self.artifact_version = rec_engine.version
+                replayed = bool(self.journal)
+            # The loaded artifacts miss the replayed changes
+            if replayed:
+                self.request_save()
+            return rec_engine
+        finally:
+            with self.lock:
+                self.journaling = False
+                self.journal = []
+
+    def _rebuild(self):
+        with self.lock:
+            self._requested_at = None
+            # The rebuilt artifacts hold every change committed so far, later
+            # ones are journaled
+            self._save_requested_at = None
+            self.rebuilding = True
+        started_at = time.perf_counter()
+        outcome = "failure"
+        try:
+            rec_engine = self._swap_in(
+                lambda: RecommenderEngine.load(force_calculation=True, path=self.path)
+            )
+            self.last_error = None
+            outcome = "success"
+            logger.info("Recommender rebuilt with %d movies", len(rec_engine.item_ids))
+        except Exception as e:
+            logger.exception("Recommender rebuild failed")
+            self.last_error = str(e)
+        finally:
+            rebuild_time.observe(time.perf_counter() - started_at, outcome=outcome)
+            with self.lock:
+                self.rebuilding = False
+
+    def _save(self):
+        with self.lock:
+            self._save_requested_at = None
+            rec_engine = self.get_engine()
+        manifest = rec_engine.save(self.path)
+        with self.lock:
+            # Unless a rebuild swapped the engine meanwhile
+            if self.get_engine() is rec_engine:
+                self.artifact_version = manifest["version"]
+        logger.info("Recommender saved with %d movies", manifest["item_count"])
+
+    def _sync(self):
+        """
+        Summary:
+            Picks up an artifact version written by another worker.
+        """
+        manifest = current_manifest(self.path)
+        if manifest is None or manifest["version"] == self.artifact_version:
+            return
+        self.artifact_version = manifest["version"]
+        if manifest.get("content_hash") == self.get_engine().content_hash():
+            # Already serving the same movies
+            return
+        # Changes of other workers keep the max id and row count as well
+        catalog_loader.invalidate()
+        rec_engine = self._swap_in(lambda: RecommenderEngine.load(path=self.path, rebuild=False))
+        if rec_engine is not None:
+            logger.info("Recommender loaded version %s of another worker", rec_engine.version)
+            return
+        df = catalog_loader.load()
+        db_hash = table_source(df["id"].to_numpy(), row_hashes(df))["content_hash"]
+        if self.get_engine().content_hash() == db_hash:
+            self.request_save()
+        else:
+            self.request_rebuild()
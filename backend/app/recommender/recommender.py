@@ -1,37 +1,135 @@
+import logging
+
+import numpy as np
 import pandas as pd
 
-from app.core.db import engine
+from app.core.metrics import ranking_time, similarity_load_time
+from app.recommender.engine import RecommenderEngine
 from app.recommender.utils.find_movie import find_movie
-from app.recommender.utils.calc_cosine_sim import calc_cosine_sim
+from app.recommender.utils.top_n import top_n
+
+logger = logging.getLogger(__name__)
 
 
-def recommender(input_title, numb_of_recommendations=3):
+def recommender(input_title, numb_of_recommendations=3, rec_engine=None):
     """
     Summary:
         Recommends similar movies based on the input movie title.
     Parameters:
         input_title (str): The title of the input movie. Some degree of spelling mistakes is allowed.
         numb_of_recommendations (int): Number of recommended movies to return. Default is 3.
+        rec_engine (RecommenderEngine): Loaded recommender state. If omitted, it is loaded from
+            the database and the neighbor index file.
     Returns:
-        DataFrame: A DataFrame containing information of the recommended movies.
-    """
-    df = pd.read_sql_table("item", con=engine)
-    movie = find_movie(input_title, df)
-    print(movie[["title", "release_year"]])
-    id = movie.index[0]
-    # Get cosine_sim matrix
-    cosine_sim = calc_cosine_sim(df)
-    # Get the similarity scores of all movies with the movie above
-    sim_scores = list(enumerate(cosine_sim[id]))
-    # Sort the similarity scores in descending order
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    # Select the top 'numb_of_recommendations' similar movies
-    # (excluding the input movie itself)
-    sim_scores = sim_scores[1 : (numb_of_recommendations + 1)]
-    print(sim_scores)
-    # Extract the indices of the top similar movies
-    similar_movies_ids = [i[0] for i in sim_scores]
-    print(df.iloc[similar_movies_ids][["title", "id"]])
-    # Get database indices
-    db_ids = df.iloc[similar_movies_ids]["id"].values.tolist()
+        list[int]: Database ids of the recommended movies. Empty if the catalog is.
+    """
+    if rec_engine is None:
+        rec_engine = RecommenderEngine.load()
+    catalog, title_index = rec_engine.lookup_state()
+    movie = find_movie(input_title, catalog, title_index)
+    if movie.empty:
+        return []
+    db_ids = recommend_rows([movie.index[0]], numb_of_recommendations, rec_engine)[0]
+    # Formatting the rows is only paid for when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Matched %r to %s, recommended %s",
+            input_title,
+            movie[["title", "release_year"]].to_dict("records"),
+            catalog.loc[catalog["id"].isin(db_ids), "title"].tolist(),
+        )
     return db_ids
+
+
+def recommend_rows(rows, numb_of_recommendations, rec_engine):
+    """
+    Summary:
+        Recommends similar movies for several neighbor index rows at once.
+        The neighbor lists of all rows are gathered and ranked as a single 2-D array.
+    Parameters:
+        rows (list[int]): Neighbor index rows of the input movies.
+        numb_of_recommendations (int | list[int]): Number of recommended movies, for all
+            rows or per row.
+        rec_engine (RecommenderEngine): Loaded recommender state.
+    Returns:
+        list[list[int]]: Database ids of the recommended movies of every row, best match first.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    counts = np.broadcast_to(np.asarray(numb_of_recommendations), rows.shape)
+    # Reading the rows of the memory-mapped index may page them in from disk. The
+    # lock keeps incremental updates from changing the lists and ids meanwhile
+    with similarity_load_time.time(), rec_engine.lock:
+        neighbor_rows = rec_engine.neighbor_ids[rows]
+        neighbor_scores = rec_engine.neighbor_scores[rows]
+        neighbor_deleted = rec_engine.deleted[neighbor_rows]
+        item_ids = rec_engine.item_ids
+    with ranking_time.time():
+        # Never recommend the input movie itself, wherever it ended up among the
+        # neighbors, the -1 padding of short neighbor lists, nor movies removed
+        # without recomputing the lists holding them
+        sim_scores = np.where(
+            (neighbor_rows < 0)
+            | neighbor_deleted
+            | (item_ids[neighbor_rows] == item_ids[rows, None]),
+            -np.inf,
+            neighbor_scores,
+        )
+        # Select the top recommendations of every row, up to the largest requested count
+        best, best_scores = top_n(sim_scores, int(counts.max(initial=0)))
+        similar_movies_ids = item_ids[np.take_along_axis(neighbor_rows, best, axis=1)]
+        keep = np.isfinite(best_scores) & (np.arange(best.shape[1]) < counts[:, None])
+    # Get database indices
+    return [ids[row_keep].tolist() for ids, row_keep in zip(similar_movies_ids, keep)]
+
+
+def recommend_batch(titles, item_ids, numb_of_recommendations, rec_engine):
+    """
+    Summary:
+        Resolves a batch of queries, each given by a title or by a database id,
+        and recommends similar movies for all of them at once. All titles are
+        matched in a single find_movie call.
+    Parameters:
+        titles (list[str | None]): Input title of every query, None for queries by id.
+        item_ids (list[int | None]): Database id of every query, None for queries by title.
+        numb_of_recommendations (list[int]): Number of recommended movies per query.
+        rec_engine (RecommenderEngine): Loaded recommender state.
+    Returns:
+        list[tuple[int | None, list[int]]]: Database id of the matched movie and of the
+        recommended movies for every query. Unknown ids match no movie and get no recommendations.
+    """
+    rows = [rec_engine.row_of(item_id) if item_id is not None else None for item_id in item_ids]
+    # Resolve all titles in a single pass
+    titled = [i for i, title in enumerate(titles) if title is not None]
+    if titled:
+        movies = find_movie([titles[i] for i in titled], *rec_engine.lookup_state())
+        for i, row in zip(titled, movies.index.tolist()):
+            rows[i] = row
+    resolved = [i for i, row in enumerate(rows) if row is not None]
+    recommended_ids = recommend_rows(
+        [rows[i] for i in resolved], [numb_of_recommendations[i] for i in resolved], rec_engine
+    )
+    results = [(None, [])] * len(rows)
+    for i, db_ids in zip(resolved, recommended_ids):
+        results[i] = (int(rec_engine.item_ids[rows[i]]), db_ids)
+    return results
+
+
+def recommend_attributes(attributes, numb_of_recommendations, rec_engine):
+    """
+    Summary:
+        Recommends movies similar to free-form attributes, which needn't match any movie
+        of the catalog. The attributes are vectorized like a movie by the feature engine
+        of the neighbor index and scored against
+        the whole catalog with a single sparse product.
+    Parameters:
+        attributes (dict[str, str | None]): Franchise, director, top_actors, genres and keywords.
+        numb_of_recommendations (int): Number of recommended movies to return.
+        rec_engine (RecommenderEngine): Loaded recommender state.
+    Returns:
+        list[int]: Database ids of the recommended movies, best match first. Movies sharing
+        no token with the attributes are never recommended.
+    """
+    with ranking_time.time():
+        vector = rec_engine.vectorize(pd.DataFrame([attributes]))
+        rows, scores = rec_engine.most_similar(vector, numb_of_recommendations)
+    return rec_engine.item_ids[rows[scores > 0]].tolist()
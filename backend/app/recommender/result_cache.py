@@ -0,0 +1,74 @@
+import threading
+
+from app.core.config import settings
+from app.core.ttl_cache import TTLCache
+
+
+class ResultCache:
+    """
+    Summary:
+        Bounded cache of recommender results with LRU eviction and a TTL.
+        Every entry belongs to a generation of the recommender, e.g. its index
+        version and number of incremental updates. Looking up or storing a
+        result with a different generation than the cached ones drops the
+        whole cache, so results of an outdated index are never served.
+    """
+
+    def __init__(self, max_size=None, ttl_seconds=None):
+        """
+        Parameters:
+            max_size (int): Maximum number of cached results. Defaults to the configured value.
+            ttl_seconds (float): Lifetime of a cached result. Defaults to the configured value.
+        """
+        self.cache = TTLCache(
+            settings.RECOMMENDER_CACHE_SIZE if max_size is None else max_size,
+            settings.RECOMMENDER_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds,
+        )
+        self.generation = None
+        self.invalidations = 0
+        # Keeps the generation check and the lookup or store that follows it together
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cache)
+
+    def stats(self):
+        """
+        Summary:
+            Returns the size and counters of the cache.
+        """
+        with self.lock:
+            return {**self.cache.stats(), "invalidations": self.invalidations}
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self.cache.clear():
+                self.invalidations += 1
+            self.generation = generation
+
+    def get(self, key, generation):
+        """
+        Summary:
+            Returns the cached result of a key, or None if it's missing or expired.
+        Parameters:
+            key (hashable): Normalized input of the cached call.
+            generation (hashable): Current generation of the recommender.
+        """
+        with self.lock:
+            self._check_generation(generation)
+            return self.cache.get(key)
+
+    def put(self, key, generation, value):
+        """
+        Summary:
+            Caches a result, evicting the least recently used ones above the size limit.
+            Results computed by an outdated recommender are not stored.
+        Parameters:
+            key (hashable): Normalized input of the cached call.
+            generation (hashable): Generation of the recommender the result was computed with.
+            value (object): Result to cache.
+        """
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.cache.put(key, value)
@@ -0,0 +1,185 @@
+import numpy as np
+from scipy import sparse
+
+
+def rank_within_rows(rows, n_rows):
+    """
+    Summary:
+        Position of every entry within its row, for entries sorted by row.
+    """
+    row_starts = np.searchsorted(rows, np.arange(n_rows))
+    return np.arange(rows.size) - row_starts[rows]
+
+
+class RandomProjectionIndex:
+    """
+    Summary:
+        Approximate cosine neighbor search with signed random projections (SimHash).
+        Every table hashes a vector to the signs of its dot products with n_bits
+        random hyperplanes. Two vectors land in the same bucket with a probability
+        that grows with their cosine similarity, so only movies sharing a bucket
+        in at least one table are scored exactly, optionally only the ones sharing
+        the most buckets. More tables raise recall, more bits per table shrink
+        the buckets and the number of scored movies.
+    """
+
+    def __init__(
+        self, n_features, n_tables=32, n_bits=8, max_bucket=256, n_candidates=None, seed=0
+    ):
+        """
+        Parameters:
+            n_features (int): Number of columns of the feature matrix.
+            n_tables (int): Number of independent hash tables.
+            n_bits (int): Number of hyperplanes, i.e. key bits, per table. At most 62.
+            max_bucket (int): Buckets larger than this are split into chunks,
+                which bounds the movies compared with every movie.
+            n_candidates (int): Number of movies scored exactly per movie, the ones
+                sharing the most buckets with it. None scores every movie sharing a bucket.
+            seed (int): Seed of the random hyperplanes, fixed for reproducible builds.
+        """
+        rng = np.random.default_rng(seed)
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.max_bucket = max_bucket
+        self.n_candidates = n_candidates
+        self.planes = rng.standard_normal((n_features, n_tables * n_bits), dtype=np.float32)
+        self.bit_values = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+        self.features = None
+        self.buckets = None
+
+    def hash(self, features, block_size=4096):
+        """
+        Summary:
+            Computes the bucket key of every row in every table.
+        Parameters:
+            features (csr_matrix): Feature matrix, rows don't need to be normalized.
+            block_size (int): Number of rows projected at once.
+        Returns:
+            ndarray: int64 keys of shape (N, n_tables).
+        """
+        n_rows = features.shape[0]
+        keys = np.empty((n_rows, self.n_tables), dtype=np.int64)
+        for start in range(0, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            signs = np.asarray(features[start:stop] @ self.planes) > 0
+            keys[start:stop] = signs.reshape(stop - start, self.n_tables, self.n_bits) @ (
+                self.bit_values
+            )
+        return keys
+
+    def fit(self, features):
+        """
+        Summary:
+            Hashes the feature matrix and keeps the buckets of every table.
+            The bucket chunks are stored as a sparse (N x chunks) membership matrix,
+            so the movies sharing chunks with a block of rows are a single sparse product.
+        Parameters:
+            features (csr_matrix): L2-normalized feature matrix.
+        Returns:
+            RandomProjectionIndex: The fitted index.
+        """
+        self.features = features
+        n_rows = features.shape[0]
+        keys = self.hash(features)
+        orders = np.argsort(keys, axis=0, kind="stable")
+        all_sorted_keys = np.take_along_axis(keys, orders, axis=0)
+        chunks = np.empty((n_rows, self.n_tables), dtype=np.int64)
+        n_chunks = 0
+        for table in range(self.n_tables):
+            sorted_keys = all_sorted_keys[:, table]
+            # Position of every sorted row within its bucket, then its chunk
+            new_bucket = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+            bucket_starts = np.flatnonzero(new_bucket)
+            rank = np.arange(n_rows) - np.repeat(
+                bucket_starts, np.diff(np.r_[bucket_starts, n_rows])
+            )
+            new_chunk = new_bucket | (rank % self.max_bucket == 0)
+            chunk = np.cumsum(new_chunk) - 1 + n_chunks
+            chunks[orders[:, table], table] = chunk
+            n_chunks = chunk[-1] + 1 if n_rows else n_chunks
+        self.buckets = sparse.csr_matrix(
+            (
+                np.ones(chunks.size, dtype=np.float32),
+                chunks.ravel(),
+                np.arange(0, chunks.size + 1, self.n_tables),
+            ),
+            shape=(n_rows, n_chunks),
+        )
+        return self
+
+    def top_k(self, k, block_size=1024):
+        """
+        Summary:
+            Scores the candidates of every fitted row exactly and keeps the best K.
+            Rows are processed in blocks, so only the candidate pairs of one
+            block are held in memory at any time.
+        Parameters:
+            k (int): Number of neighbors to keep per row.
+            block_size (int): Number of rows whose candidates are collected at once.
+        Returns:
+            tuple[ndarray, ndarray]: Neighbor row positions (int32) and their cosine
+            similarity scores (float32), both of shape (N, k), best match first and
+            ties by row position. The row itself is never included. Rows with
+            fewer than K candidates are padded with row -1 and a score of -inf.
+        """
+        n_rows = self.features.shape[0]
+        neighbor_ids = np.full((n_rows, k), -1, dtype=np.int32)
+        neighbor_scores = np.full((n_rows, k), -np.inf, dtype=np.float32)
+        buckets_t = self.buckets.T.tocsc()
+        for start in range(0, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            collisions = (self.buckets[start:stop] @ buckets_t).tocoo()
+            rows, candidates, counts = collisions.row, collisions.col, collisions.data
+            # Exclude every movie from its own candidates
+            other = candidates != rows + start
+            rows, candidates, counts = rows[other], candidates[other], counts[other]
+            if self.n_candidates is not None:
+                # Keep the candidates sharing the most buckets with every row. A single
+                # int64 sort key is much faster than lexsort over three keys
+                misses = self.n_tables - counts.astype(np.int64)
+                order = np.argsort(
+                    (rows.astype(np.int64) * (self.n_tables + 1) + misses) * n_rows + candidates
+                )
+                rows, candidates = rows[order], candidates[order]
+                keep = rank_within_rows(rows, stop - start) < self.n_candidates
+                rows, candidates = rows[keep], candidates[keep]
+            products = self.features[rows + start].multiply(self.features[candidates])
+            scores = np.asarray(products.sum(axis=1), dtype=np.float32).ravel()
+            order = np.lexsort((candidates, -scores, rows))
+            rows, candidates, scores = rows[order], candidates[order], scores[order]
+            rank = rank_within_rows(rows, stop - start)
+            keep = rank < k
+            neighbor_ids[rows[keep] + start, rank[keep]] = candidates[keep]
+            neighbor_scores[rows[keep] + start, rank[keep]] = scores[keep]
+        return neighbor_ids, neighbor_scores
+
+
+def approximate_top_k_neighbors(
+    features, k=50, n_tables=32, n_bits=8, n_candidates=None, block_size=1024, seed=0
+):
+    """
+    Summary:
+        Approximate counterpart of top_k_neighbors: every movie is only scored
+        against the movies sharing a random projection bucket with it, instead
+        of against the whole catalog.
+    Parameters:
+        features (csr_matrix): L2-normalized feature matrix.
+        k (int): Number of neighbors to keep per row.
+        n_tables (int): Number of hash tables.
+        n_bits (int): Number of key bits per table.
+        n_candidates (int): Number of movies scored exactly per movie, None scores
+            every movie sharing a bucket.
+        block_size (int): Number of rows whose candidates are collected at once.
+        seed (int): Seed of the random hyperplanes.
+    Returns:
+        tuple[ndarray, ndarray]: Neighbor row positions (int32) and their cosine
+        similarity scores (float32), both of shape (N, k), best match first. Movies
+        with fewer than K candidates are padded with row -1 and a score of -inf.
+    """
+    k = max(min(k, features.shape[0] - 1), 0)
+    if n_candidates is not None:
+        n_candidates = max(n_candidates, k)
+    index = RandomProjectionIndex(
+        features.shape[1], n_tables, n_bits, n_candidates=n_candidates, seed=seed
+    )
+    return index.fit(features).top_k(k, block_size)
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy import sparse
+
+ARTIFACTS_PATH = "../backend/app/recommender/data"
+# Bumped whenever the layout of an artifact version changes
+FORMAT_VERSION = 4
+# Versions kept on disk, older ones may still be mapped by running workers
+KEEP_VERSIONS = 2
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+VOCABULARY_FILE = "vocabulary.json"
+
+
+def atomic_write(file_path, write, mode="wb"):
+    """
+    Summary:
+        Writes a file under a temporary name in the same directory and renames it
+        into place, so readers never see a partially written file.
+    Parameters:
+        file_path (str): Final path of the file.
+        write (callable): Function writing the contents into an open file object.
+        mode (str): Mode the temporary file is opened with.
+    """
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as file:
+            write(file)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def file_checksum(file_path):
+    """
+    Summary:
+        Returns the SHA-256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sparse_arrays(name, matrix):
+    """
+    Summary:
+        Splits a CSR matrix into the arrays it's stored as, so it can be
+        memory-mapped like any other artifact array.
+    Parameters:
+        name (str): Name of the matrix.
+        matrix (csr_matrix): Matrix to store.
+    Returns:
+        dict[str, ndarray]: data, indices and indptr arrays prefixed by the name.
+    """
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    return {
+        f"{name}_data": matrix.data,
+        f"{name}_indices": matrix.indices,
+        f"{name}_indptr": matrix.indptr,
+    }
+
+
+def sparse_matrix(arrays, name, n_columns):
+    """
+    Summary:
+        Reassembles a CSR matrix stored by sparse_arrays without copying its arrays.
+    Parameters:
+        arrays (dict[str, ndarray]): Arrays returned by load_artifacts.
+        name (str): Name of the matrix.
+        n_columns (int): Number of columns of the matrix.
+    Returns:
+        csr_matrix: The stored matrix.
+    """
+    indptr = arrays[f"{name}_indptr"]
+    return sparse.csr_matrix(
+        (arrays[f"{name}_data"], arrays[f"{name}_indices"], indptr),
+        shape=(len(indptr) - 1, n_columns),
+        copy=False,
+    )
+
+
+def save_artifacts(arrays, vocabulary, source, path=ARTIFACTS_PATH, feature_config=None):
+    """
+    Summary:
+        Writes a new version of the recommender artifacts and makes it current.
+        Every array is stored as its own .npy file, so it can be memory-mapped.
+        The version is written into a temporary directory which is renamed into
+        place, then the CURRENT pointer is replaced atomically.
+    Parameters:
+        arrays (dict[str, ndarray]): Arrays to store. Must contain "item_ids",
+            the database id of the movie of every row.
+        vocabulary (dict[str, dict[str, int]]): Vocabulary of every field of the fitted FeatureEngine.
+        source (dict): Description of the item table the artifacts were built from,
+            see table_source.
+        path (str): Directory holding all artifact versions.
+        feature_config (dict): How the stored feature matrix was weighted, stored in the manifest.
+    Returns:
+        dict: Manifest of the written version.
+    """
+    os.makedirs(path, exist_ok=True)
+    version = time.time_ns() // 1000
+    tmp_dir = tempfile.mkdtemp(dir=path, suffix=".tmp")
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, VOCABULARY_FILE), "w") as file:
+            json.dump(vocabulary, file)
+        files = sorted(os.listdir(tmp_dir))
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": version,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "item_count": len(arrays["item_ids"]),
+            "feature_config": feature_config,
+            "db_max_id": source["db_max_id"],
+            "db_row_count": source["db_row_count"],
+            "content_hash": source["content_hash"],
+            "checksums": {name: file_checksum(os.path.join(tmp_dir, name)) for name in files},
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_dir, os.path.join(path, f"v{version}"))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    atomic_write(
+        os.path.join(path, CURRENT_FILE), lambda file: file.write(f"v{version}"), mode="w"
+    )
+    prune_artifacts(path)
+    return manifest
+
+
+def prune_artifacts(path=ARTIFACTS_PATH, keep=KEEP_VERSIONS):
+    """
+    Summary:
+        Deletes all but the newest artifact versions. Workers that still map
+        a deleted version keep reading it until they reload.
+    """
+    versions = sorted(
+        (entry for entry in os.listdir(path) if entry.startswith("v") and entry[1:].isdigit()),
+        key=lambda entry: int(entry[1:]),
+    )
+    for entry in versions[:-keep]:
+        shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+
+def current_manifest(path=ARTIFACTS_PATH):
+    """
+    Summary:
+        Reads the manifest of the current artifact version without opening its arrays,
+        to check cheaply whether another process wrote a new version.
+    Returns:
+        dict: Manifest of the current version, None if there is none.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as file:
+            version_dir = os.path.join(path, file.read().strip())
+        with open(os.path.join(version_dir, MANIFEST_FILE)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def load_artifacts(path=ARTIFACTS_PATH, mmap_mode="c"):
+    """
+    Summary:
+        Opens the current version of the recommender artifacts.
+        Arrays are memory-mapped, so every worker process shares the same page
+        cache instead of holding a private copy. The default copy-on-write mode
+        keeps in-place updates private to the process.
+    Parameters:
+        path (str): Directory holding all artifact versions.
+        mmap_mode (str): Mode passed to np.load, None reads the arrays into memory.
+    Returns:
+        tuple[dict, dict[str, ndarray], dict[str, dict[str, int]]]: Manifest, arrays by name
+        and vocabulary of the current version.
+    Raises:
+        FileNotFoundError: No complete artifact version exists.
+        ValueError: The artifact has an unknown format or doesn't match its checksums.
+    """
+    with open(os.path.join(path, CURRENT_FILE)) as file:
+        version_dir = os.path.join(path, file.read().strip())
+    with open(os.path.join(version_dir, MANIFEST_FILE)) as file:
+        manifest = json.load(file)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')}")
+    for name, checksum in manifest["checksums"].items():
+        if file_checksum(os.path.join(version_dir, name)) != checksum:
+            raise ValueError(f"Checksum mismatch of {name} in {version_dir}")
+    arrays = {
+        name[: -len(".npy")]: np.load(os.path.join(version_dir, name), mmap_mode=mmap_mode)
+        for name in manifest["checksums"]
+        if name.endswith(".npy")
+    }
+    with open(os.path.join(version_dir, VOCABULARY_FILE)) as file:
+        vocabulary = json.load(file)
+    return manifest, arrays, vocabulary
+
+
+def table_source(item_ids, hashes):
+    """
+    Summary:
+        Describes a state of the item table, as stored in the manifest. The content
+        hash is the sum of the row hashes, so it changes with every item update and
+        can be maintained incrementally.
+    Parameters:
+        item_ids (ndarray): Database id of every row.
+        hashes (ndarray): uint64 content hash of every row, see catalog.row_hashes.
+    Returns:
+        dict: "db_max_id", "db_row_count" and "content_hash" of the table.
+    """
+    return {
+        "db_max_id": int(item_ids.max()) if len(item_ids) else None,
+        "db_row_count": len(item_ids),
+        "content_hash": int(np.sum(hashes, dtype=np.uint64)),
+    }
+
+
+def is_stale(manifest, source):
+    """
+    Summary:
+        Whether artifacts were built from a different state of the item table.
+    Parameters:
+        manifest (dict): Manifest of the artifacts.
+        source (dict): Current state of the item table, see table_source.
+    Returns:
+        bool: True if the artifacts need to be rebuilt.
+    """
+    return (
+        manifest["db_max_id"] != source["db_max_id"]
+        or manifest["db_row_count"] != source["db_row_count"]
+        or manifest["item_count"] != source["db_row_count"]
+        or manifest["content_hash"] != source["content_hash"]
+    )
@@ -1,100 +1,136 @@
-import re
+import logging
 
-import nltk
 import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-from app.core.db import engine
+from app.core.config import settings
+from app.recommender.utils.approximate_neighbors import approximate_top_k_neighbors
+from app.recommender.utils.artifacts import (
+    ARTIFACTS_PATH,
+    load_artifacts,
+    save_artifacts,
+    sparse_arrays,
+    table_source,
+)
+from app.recommender.utils.catalog import catalog_loader, row_hashes
+from app.recommender.utils.feature_engine import FeatureEngine
+from app.recommender.utils.parallel_neighbors import parallel_top_k_neighbors
+from app.recommender.utils.top_n import top_n
 
+logger = logging.getLogger(__name__)
 
-def preprocess(text):
+
+def top_k_neighbors(features, k=50, block_size=1024, workers=1):
     """
     Summary:
-        Preprocesses the input text by removing non-alphanumeric characters,
-        converting to lowercase, tokenizing, and filtering out stopwords.
+        Computes the top-K most similar rows for every row of a sparse feature matrix.
+        Rows are processed in blocks, so only a (block_size x N) slice of the
+        similarity matrix is held in memory at any time, per worker.
     Parameters:
-        text (str): Input text to be preprocessed.
+        features (csr_matrix): L2-normalized feature matrix produced by FeatureEngine.
+        k (int): Number of neighbors to keep per row.
+        block_size (int): Number of rows scored at once.
+        workers (int): Number of processes scoring blocks in parallel. 1 scores them
+            in the calling process.
     Returns:
-        str: Preprocessed text
+        tuple[ndarray, ndarray]: Neighbor row positions (int32) and their cosine
+        similarity scores (float32), both of shape (N, k), best match first.
+        Equally similar neighbors are ordered by row position.
+        The row itself is never included among its neighbors.
     """
-    # Handle NaN
-    if not isinstance(text, str):
-        return ""
-    # Remove non-alphanumeric characters, convert to lowercase, and 
-    # strip leading/trailing whitespaces
-    text = re.sub(r"[^0-9a-zA-Z\s]", "", text, re.I | re.A).lower().strip()
-    # Tokenize each sentence using WordPunctTokenizer from NLTK
-    wpt = nltk.WordPunctTokenizer() # Get the list of stopwords in English from NLTK
-    stop_words = nltk.corpus.stopwords.words("english")
-    output = []
-    # Tokenize and filter out stopwords to create a new list of tokens
-    tokens = wpt.tokenize(text)
-    filtered_tokens = [token for token in tokens if token not in stop_words]
-    # Join the filtered tokens into a sentence. Then append it to the output list
-    output.append(" ".join(filtered_tokens))
-    # Join all the processed sentences into a single text string
-    return " ".join(output)
+    n_rows = features.shape[0]
+    k = max(min(k, n_rows - 1), 0)
+    neighbor_ids = np.empty((n_rows, k), dtype=np.int32)
+    neighbor_scores = np.empty((n_rows, k), dtype=np.float32)
+    if k == 0:
+        return neighbor_ids, neighbor_scores
+    if workers > 1 and n_rows > block_size:
+        return parallel_top_k_neighbors(features, k, block_size, workers)
+    features_t = features.T.tocsc()
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        block = (features[start:stop] @ features_t).toarray()
+        # Exclude every movie from its own neighbor list
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        neighbor_ids[start:stop], neighbor_scores[start:stop] = top_n(block, k)
+    return neighbor_ids, neighbor_scores
 
 
 def calc_cosine_sim(
     df=None,
-    file_path="../backend/app/recommender/data/cosine_sim.npy",
-    force_calculation=False
+    path=ARTIFACTS_PATH,
+    force_calculation=False,
+    k=50,
+    block_size=None,
+    workers=None,
+    mode=None,
 ):
     """
     Summary:
-        Calculate the cosine similarity matrix for a DataFrame containing movie features.
-        If the cosine similarity matrix exists in the specified file path, read and return it.
-        Otherwise, perform the calculations, save the matrix to the file, and return it.
+        Calculate the top-K cosine similarity neighbor index for a DataFrame containing movie features.
+        If the neighbor index exists in the specified artifact directory, read and return it.
+        Otherwise, perform the calculations, save the index as a new artifact version, and return it.
+        The database ids and content hashes of the indexed movies, the vocabulary and
+        IDF of the fitted FeatureEngine, the normalized feature matrix and the feature
+        config are saved with the index, so single movies can later be vectorized and scored
+        against the catalog without refitting.
     Parameters:
-        df (DataFrame): DataFrame containing movie data.
-        file_path (str): Path to save/read the cosine similarity matrix.
-        force_calculation (bool): Forcefully recalculate matrix. Used when appending new movie.
+        df (DataFrame): DataFrame containing movie data. The shared catalog snapshot if omitted.
+        path (str): Directory to save/read the artifact versions.
+        force_calculation (bool): Forcefully recalculate index. Used when appending new movie.
+        k (int): Number of neighbors stored per movie.
+        block_size (int): Number of movies scored at once. Bounds peak memory during calculation.
+            Defaults to the configured value.
+        workers (int): Number of processes calculating the index. Defaults to the configured value.
+        mode (str): "exact" compares every pair of movies, "approximate" only the movies
+            sharing a random projection bucket. Defaults to the configured value.
     Returns:
-        ndarray: Cosine similarity matrix for the movie features.
+        tuple[ndarray, ndarray]: Neighbor row positions and cosine similarity scores
+        for every movie, best match first.
     """
     if not force_calculation:
-        print("Calculations are forced")
-        print("Calculations aren't forced")
         try:
-            cosine_sim = np.load(file_path)
-            print("File with cosine_sim matrix is already calculated and found")
-            print("Returning it...")
-            return cosine_sim
-        except FileNotFoundError:
-            print("File with cosine_sim matrix not found")
-            print("Calculating the matrix...")
+            _, arrays, _ = load_artifacts(path)
+            logger.debug("Neighbor index found in %s", path)
+            return arrays["neighbor_ids"], arrays["neighbor_scores"]
+        except (FileNotFoundError, ValueError):
+            logger.info("Neighbor index not found in %s, calculating it", path)
     else:
-        print("Calculations are forced")
+        logger.info("Calculating the neighbor index")
 
     if df is None:
-        df = pd.read_sql_table(
-            "item",
-            con=engine,
-            columns=[
-                "franchise",
-                "director",
-                "top_actors",
-                "genres",
-                "keywords"
-            ]
+        df = catalog_loader.load()
+    feature_engine = FeatureEngine()
+    features = feature_engine.fit_transform(df)
+    block_size = block_size or settings.RECOMMENDER_BUILD_BLOCK_SIZE
+    if (mode or settings.RECOMMENDER_NEIGHBOR_MODE) == "approximate":
+        neighbor_ids, neighbor_scores = approximate_top_k_neighbors(
+            features,
+            k=k,
+            n_tables=settings.RECOMMENDER_ANN_TABLES,
+            n_bits=settings.RECOMMENDER_ANN_BITS,
+            block_size=block_size,
         )
     else:
-        df = df.copy()
-    # repeat director once, to give this column more weight
-    df["combined"] = (
-        df["franchise"].fillna("") + "; " +
-        df["director"].fillna("") + "; " +
-        df["director"].fillna("") + "; " +
-        df["top_actors"].fillna("") + "; " +
-        df["genres"].fillna("") + "; " +
-        df["keywords"].fillna("")
+        neighbor_ids, neighbor_scores = top_k_neighbors(
+            features,
+            k=k,
+            block_size=block_size,
+            workers=workers or settings.RECOMMENDER_BUILD_WORKERS,
+        )
+    item_ids = df["id"].to_numpy(dtype=np.int64)
+    hashes = row_hashes(df)
+    save_artifacts(
+        {
+            "neighbor_ids": neighbor_ids,
+            "neighbor_scores": neighbor_scores,
+            "item_ids": item_ids,
+            "row_hashes": hashes,
+            "idf": feature_engine.idf,
+            **sparse_arrays("features", features),
+        },
+        feature_engine.vocabulary,
+        table_source(item_ids, hashes),
+        path,
+        feature_config=feature_engine.config,
     )
-    df["preproc"] = df["combined"].apply(preprocess)
-    cv = CountVectorizer()
-    cv_matrix = cv.fit_transform(df["preproc"])
-    cosine_sim = cosine_similarity(cv_matrix, cv_matrix)
-    np.save(file_path, cosine_sim)
-    return cosine_sim
+    return neighbor_ids, neighbor_scores
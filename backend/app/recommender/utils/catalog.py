@@ -0,0 +1,137 @@
+import threading
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from app.core.db import engine
+from app.models import Item
+from app.recommender.utils.feature_engine import FIELDS
+
+# Columns the recommender reads from the item table
+CATALOG_COLUMNS = ("id", "title", "release_year", *FIELDS)
+# Rows fetched from the server-side cursor at once
+CHUNK_SIZE = 10_000
+
+try:
+    import pyarrow  # noqa: F401
+
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+
+def catalog_source(connection):
+    """
+    Summary:
+        Describes the current state of the item table without reading it.
+    Parameters:
+        connection (Connection): Open database connection.
+    Returns:
+        dict: "db_max_id" and "db_row_count" of the table, see table_source.
+    """
+    max_id, row_count = connection.execute(
+        select(func.max(Item.id), func.count()).select_from(Item)
+    ).one()
+    return {"db_max_id": max_id, "db_row_count": row_count}
+
+
+def row_hashes(df, columns=CATALOG_COLUMNS):
+    """
+    Summary:
+        Hashes the recommender columns of every movie. Rows read from the table
+        and rows built from an Item hash alike, whatever their dtypes.
+    Parameters:
+        df (DataFrame): Movie data with the given columns.
+        columns (tuple[str]): Columns to hash, "id" first.
+    Returns:
+        ndarray: uint64 hash of every row.
+    """
+    values = df[list(columns)].astype({column: object for column in columns[1:]})
+    values = values.where(values.notna(), None)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def read_catalog(connection, columns=CATALOG_COLUMNS, chunk_size=CHUNK_SIZE):
+    """
+    Summary:
+        Streams the given columns of the item table through a server-side cursor,
+        chunk by chunk, into a compact DataFrame. Text columns are stored as
+        string arrays instead of Python object columns.
+    Parameters:
+        connection (Connection): Open database connection.
+        columns (tuple[str]): Columns to read, "id" first.
+        chunk_size (int): Number of rows fetched at once.
+    Returns:
+        DataFrame: Movie data ordered by id.
+    """
+    statement = select(*(getattr(Item, column) for column in columns)).order_by(Item.id)
+    chunks = pd.read_sql_query(
+        statement,
+        connection.execution_options(stream_results=True, max_row_buffer=chunk_size),
+        chunksize=chunk_size,
+    )
+    chunks = [
+        chunk.astype({column: STRING_DTYPE for column in columns if column != "id"})
+        for chunk in chunks
+    ]
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=STRING_DTYPE) for column in columns})
+    return pd.concat(chunks, ignore_index=True).astype({"id": "int64"})
+
+
+class CatalogLoader:
+    """
+    Summary:
+        Shared snapshot of the item table used by every recommender component.
+        The table is only read again when its max id or row count changed, or
+        after invalidate() reported a change neither of them shows, like an update.
+    """
+
+    def __init__(self, columns=CATALOG_COLUMNS, db_engine=None):
+        """
+        Parameters:
+            columns (tuple[str]): Columns of the snapshot, "id" first.
+            db_engine (Engine): Database the item table is read from. Defaults to the app database.
+        """
+        self.columns = columns
+        self.engine = engine if db_engine is None else db_engine
+        self.snapshot = None
+        self.source = None
+        self.reloads = 0
+        self.lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Summary:
+            Drops the snapshot, the next load reads the table again.
+        """
+        with self.lock:
+            self.snapshot = None
+            self.source = None
+
+    def load(self, force=False):
+        """
+        Summary:
+            Returns the snapshot of the item table, reading it only if it changed.
+        Parameters:
+            force (bool): Read the table even if it looks unchanged.
+        Returns:
+            DataFrame: Movie data ordered by id. Shared, callers must not modify it.
+        """
+        # Both queries see the same state of the table. REPEATABLE READ is enough
+        # for that on PostgreSQL, SQLite only supports SERIALIZABLE
+        isolation_level = (
+            "REPEATABLE READ" if self.engine.dialect.name == "postgresql" else "SERIALIZABLE"
+        )
+        with self.lock, self.engine.connect().execution_options(
+            isolation_level=isolation_level
+        ) as connection:
+            source = catalog_source(connection)
+            if force or self.snapshot is None or source != self.source:
+                self.snapshot = read_catalog(connection, self.columns)
+                self.source = source
+                self.reloads += 1
+            return self.snapshot
+
+
+catalog_loader = CatalogLoader()
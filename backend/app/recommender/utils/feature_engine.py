@@ -0,0 +1,259 @@
+import re
+from functools import cache
+
+import nltk
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from app.core.config import settings
+
+# Movie columns every feature is taken from, in the order of their blocks
+FIELDS = ("franchise", "director", "top_actors", "genres", "keywords")
+
+# Compiled once, applied to every movie of the catalog
+NON_ALPHANUMERIC = re.compile(r"[^0-9a-zA-Z\s]")
+
+
+@cache
+def get_stop_words():
+    """
+    Summary:
+        Loads the English stopwords from NLTK once and keeps them as a set.
+    Returns:
+        frozenset[str]: English stopwords.
+    """
+    return frozenset(nltk.corpus.stopwords.words("english"))
+
+
+def tokenize(text):
+    """
+    Summary:
+        Removes non-alphanumeric characters, converts to lowercase, splits
+        on whitespace and filters out stopwords.
+    Parameters:
+        text (str): Input text to be tokenized.
+    Returns:
+        list[str]: Filtered tokens. Empty for NaN.
+    """
+    # Handle NaN
+    if not isinstance(text, str):
+        return []
+    stop_words = get_stop_words()
+    # Only alphanumerics and whitespace are left, so splitting on
+    # whitespace gives the same tokens as nltk.WordPunctTokenizer
+    tokens = NON_ALPHANUMERIC.sub("", text).lower().split()
+    return [token for token in tokens if token not in stop_words]
+
+
+def analyze(text):
+    """
+    Summary:
+        CountVectorizer analyzer producing the same tokens as the default
+        CountVectorizer run over the space-joined tokenize(text), in a single pass:
+        single-character tokens are dropped by its default token pattern.
+    Parameters:
+        text (str): Text of a movie feature column.
+    Returns:
+        list[str]: Tokens to count.
+    """
+    return [token for token in tokenize(text) if len(token) > 1]
+
+
+def normalize_features(features):
+    """
+    Summary:
+        L2-normalizes the rows of a feature matrix, so cosine similarity becomes a plain dot product.
+    Parameters:
+        features (sparse matrix): Weighted feature matrix.
+    Returns:
+        csr_matrix: Normalized float32 feature matrix.
+    """
+    features = features.astype(np.float32).tocsr()
+    if 0 in features.shape:
+        # Empty catalog or vocabulary, which sklearn refuses to normalize
+        return features
+    return normalize(features, norm="l2", copy=False).tocsr()
+
+
+class FeatureEngine:
+    """
+    Summary:
+        Turns movies into sparse feature vectors. Every field is tokenized into
+        its own block of columns with its own vocabulary, so the same name as a
+        director and as an actor are different features. Term counts are scaled
+        by the inverse document frequency of the token within its field, so
+        tokens shared by much of the catalog, like common genres, weigh less.
+        Then every block is multiplied by the weight of its field, and the whole
+        row is L2-normalized once, so cosine similarity is a plain sparse dot product.
+        Tokenizing (count_blocks) and weighting (weight) are separate steps, so
+        field weights can be tuned on the same counts without re-tokenizing.
+    """
+
+    def __init__(self, field_weights=None, use_idf=None):
+        """
+        Parameters:
+            field_weights (dict[str, float]): Weight of every field. Defaults to the configured weights.
+            use_idf (bool): Scale term counts by inverse document frequency. Defaults
+                to the configured value.
+        """
+        if field_weights is None:
+            field_weights = settings.RECOMMENDER_FIELD_WEIGHTS
+        if use_idf is None:
+            use_idf = settings.RECOMMENDER_USE_IDF
+        self.field_weights = {field: float(field_weights.get(field, 0.0)) for field in FIELDS}
+        self.use_idf = use_idf
+        self.vocabulary = None
+        self.vectorizers = None
+        self.idf = None
+
+    @property
+    def config(self):
+        """
+        Summary:
+            Weighting of the engine, stored in the artifact manifest. Features built
+            with a different config can't be compared with the ones of this engine.
+        """
+        return {
+            "fields": self.field_weights,
+            "weighting": "tfidf" if self.use_idf else "count",
+            "norm": "l2",
+        }
+
+    @property
+    def n_features(self):
+        return sum(len(self.vocabulary[field]) for field in FIELDS)
+
+    def load_state(self, vocabulary, idf):
+        """
+        Summary:
+            Restores a fitted engine from a stored vocabulary and IDF, without refitting.
+        Parameters:
+            vocabulary (dict[str, dict[str, int]]): Vocabulary of every field, with token
+                columns local to the field's block.
+            idf (ndarray): Inverse document frequency of every column.
+        Returns:
+            FeatureEngine: The engine, ready to transform.
+        """
+        self.vocabulary = {field: vocabulary.get(field, {}) for field in FIELDS}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self._build_vectorizers()
+        return self
+
+    def _build_vectorizers(self):
+        # Fields without any token have no vectorizer, their block is empty
+        self.vectorizers = {}
+        for field in FIELDS:
+            if self.vocabulary[field]:
+                vectorizer = CountVectorizer(analyzer=analyze, vocabulary=self.vocabulary[field])
+                # Validates the vocabulary once instead of on the first request
+                vectorizer.transform([])
+                self.vectorizers[field] = vectorizer
+
+    def fit_transform(self, df):
+        """
+        Summary:
+            Fits the vocabulary and IDF of every field on the movies and returns their features.
+        Parameters:
+            df (DataFrame): Movie data with a column per field.
+        Returns:
+            csr_matrix: Normalized float32 feature rows, one per movie.
+        """
+        self.vocabulary = {}
+        blocks = {}
+        for field in FIELDS:
+            vectorizer = CountVectorizer(analyzer=analyze)
+            try:
+                blocks[field] = vectorizer.fit_transform(df[field].fillna(""))
+                self.vocabulary[field] = {
+                    token: int(column) for token, column in vectorizer.vocabulary_.items()
+                }
+            except ValueError:
+                # No movie has a token in this field
+                blocks[field] = sparse.csr_matrix((len(df), 0), dtype=np.int64)
+                self.vocabulary[field] = {}
+        idf = []
+        for field in FIELDS:
+            # Smoothed like sklearn's TfidfTransformer: ln((1 + N) / (1 + df)) + 1
+            document_frequency = np.bincount(
+                blocks[field].indices, minlength=blocks[field].shape[1]
+            )
+            idf.append(np.log((1 + len(df)) / (1 + document_frequency)) + 1)
+        self.idf = np.concatenate(idf).astype(np.float32)
+        self._build_vectorizers()
+        return self.weight(blocks)
+
+    def count_blocks(self, df):
+        """
+        Summary:
+            Tokenizes every field of the movies into its block of term counts.
+        Parameters:
+            df (DataFrame): Movie data with a column per field.
+        Returns:
+            dict[str, csr_matrix]: Term counts of every field.
+        """
+        blocks = {}
+        for field in FIELDS:
+            if field in self.vectorizers:
+                blocks[field] = self.vectorizers[field].transform(df[field].fillna(""))
+            else:
+                blocks[field] = sparse.csr_matrix((len(df), 0), dtype=np.int64)
+        return blocks
+
+    def weight(self, blocks):
+        """
+        Summary:
+            Applies IDF and field weights to term counts and L2-normalizes the rows.
+        Parameters:
+            blocks (dict[str, csr_matrix]): Term counts of every field, see count_blocks.
+        Returns:
+            csr_matrix: Normalized float32 feature rows.
+        """
+        column_weights = np.concatenate(
+            [
+                np.full(blocks[field].shape[1], self.field_weights[field], dtype=np.float32)
+                for field in FIELDS
+            ]
+        )
+        if self.use_idf:
+            column_weights *= self.idf
+        features = sparse.hstack([blocks[field] for field in FIELDS], format="csr")
+        return normalize_features(features @ sparse.diags(column_weights))
+
+    def transform(self, df):
+        """
+        Summary:
+            Vectorizes movies with the fitted vocabularies, without refitting.
+        Parameters:
+            df (DataFrame): Movie data with a column per field.
+        Returns:
+            csr_matrix: Normalized float32 feature rows, one per movie.
+        """
+        return self.weight(self.count_blocks(df))
+
+    def unseen_tokens(self, record):
+        """
+        Summary:
+            Tokens of a movie missing from the vocabulary of their field.
+        Parameters:
+            record (dict): Movie data with a value per field.
+        Returns:
+            set[tuple[str, str]]: Field and token of every unseen token.
+        """
+        return {
+            (field, token)
+            for field in FIELDS
+            for token in analyze(record.get(field))
+            if token not in self.vocabulary[field]
+        }
+
+    def token_key(self, record):
+        """
+        Summary:
+            Hashable key of the weighted tokens of a movie. Movies with the same key
+            have the same feature vector.
+        Parameters:
+            record (dict): Movie data with a value per field.
+        """
+        return tuple((field, tuple(sorted(analyze(record.get(field))))) for field in FIELDS)
@@ -1,22 +1,38 @@
-import pandas as pd
 from fuzzywuzzy import process
 
-from app.core.db import engine
+from app.core.metrics import title_match_time
+from app.recommender.utils.catalog import catalog_loader
 
 
-def find_movie(input, df=None):
+@title_match_time.time()
+def find_movie(input, df=None, title_index=None):
     """
     Summary:
         Finds a movie in the DataFrame that closely matches the input title. Handles some spelling mistakes
+        A list of titles is resolved in a single call, with one matched row per title.
     Parameters:
-        input (str): The input movie title.
+        input (str | list[str]): The input movie title, or several of them.
+        df (DataFrame): Movie data. The shared catalog snapshot if omitted.
+        title_index (TitleIndex): Prebuilt index over df["title"]. If given, it is used
+            instead of scanning every title.
     Returns:
-        DataFrame: A DataFrame row containing information about the matched movie.
+        DataFrame: A DataFrame row containing information about the matched movie,
+        or one row per input title, in input order. No rows if the catalog is empty.
     """
     if df is None:
-        # Load the DataFrame from the SQL table
-        df = pd.read_sql_table("item", con=engine)
+        df = catalog_loader.load()
+    if title_index is not None:
+        inputs = [input] if isinstance(input, str) else input
+        positions = [title_index.find(title) for title in inputs]
+        # The index only finds nothing when it holds no titles
+        return df.iloc[[] if None in positions else positions]
     all_titles = df["title"].tolist()
-    closest_match = process.extractOne(input, all_titles)
-    matched_title = closest_match[0]
-    return df[df["title"] == matched_title]
+    if not all_titles:
+        return df.iloc[[]]
+    if isinstance(input, str):
+        closest_match = process.extractOne(input, all_titles)
+        matched_title = closest_match[0]
+        return df[df["title"] == matched_title]
+    # First row carrying the best matching title of every input
+    positions = [all_titles.index(process.extractOne(title, all_titles)[0]) for title in input]
+    return df.iloc[positions]
@@ -0,0 +1,132 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+
+from app.recommender.utils.top_n import top_n
+
+# Arrays attached by a worker process, set up once by init_worker
+_worker_state = {}
+
+
+def share_array(array):
+    """
+    Summary:
+        Copies an array into a new shared memory block.
+    Parameters:
+        array (ndarray): Array to share.
+    Returns:
+        tuple[SharedMemory, tuple]: The shared memory block, and the name, shape and
+        dtype the array is attached with.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_array(descriptor, shm=None):
+    """
+    Summary:
+        Attaches an array shared by share_array, without copying it.
+    Parameters:
+        descriptor (tuple): Name, shape and dtype returned by share_array.
+        shm (SharedMemory): Already open block of the array, if any.
+    Returns:
+        tuple[SharedMemory, ndarray]: The attached block, which must stay open
+        as long as the array is used, and the array.
+    """
+    name, shape, dtype = descriptor
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def init_worker(descriptors, shape):
+    """
+    Summary:
+        Attaches the shared feature matrix and output arrays in a worker process.
+    """
+    arrays = {}
+    for key, descriptor in descriptors.items():
+        shm, arrays[key] = attach_array(descriptor)
+        _worker_state.setdefault("shms", []).append(shm)
+    features = sparse.csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False
+    )
+    _worker_state["features"] = features
+    _worker_state["features_t"] = features.T.tocsc()
+    _worker_state["neighbor_ids"] = arrays["neighbor_ids"]
+    _worker_state["neighbor_scores"] = arrays["neighbor_scores"]
+
+
+def score_block(start, stop):
+    """
+    Summary:
+        Computes the top-K neighbors of rows [start, stop) in a worker process and
+        writes them straight into the shared output arrays.
+    """
+    features = _worker_state["features"]
+    neighbor_ids = _worker_state["neighbor_ids"]
+    neighbor_scores = _worker_state["neighbor_scores"]
+    block = (features[start:stop] @ _worker_state["features_t"]).toarray()
+    # Exclude every movie from its own neighbor list
+    block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+    neighbor_ids[start:stop], neighbor_scores[start:stop] = top_n(block, neighbor_ids.shape[1])
+
+
+def parallel_top_k_neighbors(features, k, block_size, workers):
+    """
+    Summary:
+        Computes the top-K most similar rows of a normalized feature matrix in a
+        process pool. The matrix and the output arrays live in shared memory, so
+        workers don't receive copies of them. Every worker scores one block of
+        rows at a time, which bounds its memory to a (block_size x N) slice of
+        the similarity matrix. The result is identical to the serial build.
+    Parameters:
+        features (csr_matrix): L2-normalized float32 feature matrix.
+        k (int): Number of neighbors to keep per row, at most N - 1.
+        block_size (int): Number of rows scored at once by a worker.
+        workers (int): Number of worker processes.
+    Returns:
+        tuple[ndarray, ndarray]: Neighbor row positions (int32) and their cosine
+        similarity scores (float32), both of shape (N, k), best match first.
+    """
+    n_rows = features.shape[0]
+    features = features.tocsr()
+    features.sort_indices()
+    shms = {}
+    try:
+        descriptors = {}
+        for key, array in (
+            ("data", features.data),
+            ("indices", features.indices),
+            ("indptr", features.indptr),
+            ("neighbor_ids", np.zeros((n_rows, k), dtype=np.int32)),
+            ("neighbor_scores", np.zeros((n_rows, k), dtype=np.float32)),
+        ):
+            shms[key], descriptors[key] = share_array(array)
+        # Spawned workers don't inherit the threads and locks of the server process
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(descriptors, features.shape),
+        ) as pool:
+            futures = [
+                pool.submit(score_block, start, min(start + block_size, n_rows))
+                for start in range(0, n_rows, block_size)
+            ]
+            for future in futures:
+                future.result()
+        # Copy the results out, the shared blocks are released below
+        neighbor_ids = attach_array(descriptors["neighbor_ids"], shms["neighbor_ids"])[1].copy()
+        neighbor_scores = attach_array(
+            descriptors["neighbor_scores"], shms["neighbor_scores"]
+        )[1].copy()
+        return neighbor_ids, neighbor_scores
+    finally:
+        for shm in shms.values():
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,525 @@
+from collections import defaultdict
+
+import numpy as np
+from fuzzywuzzy import fuzz, utils
+
+
+def normalize_title(title):
+    """
+    Summary:
+        Normalizes a title the same way fuzzywuzzy's extractOne does before scoring:
+        non-alphanumeric characters become whitespace, the result is lowercased,
+        stripped and forced to ASCII.
+    Parameters:
+        title (str): Title to normalize.
+    Returns:
+        str: Normalized title.
+    """
+    return utils.full_process(title, force_ascii=True)
+
+
+# Characters normalized titles are mostly made of, others are counted in a last column
+CHARACTERS = "0123456789abcdefghijklmnopqrstuvwxyz _"
+CHARACTER_COLUMNS = np.full(128, len(CHARACTERS), dtype=np.intp)
+CHARACTER_COLUMNS[[ord(char) for char in CHARACTERS]] = np.arange(len(CHARACTERS))
+
+
+def char_counts(text):
+    """
+    Summary:
+        Returns how often each character occurs in a normalized title.
+    """
+    # Normalizing keeps a few non-ASCII characters, like numeric fractions
+    codes = np.minimum(np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32), 127)
+    return np.bincount(CHARACTER_COLUMNS[codes], minlength=len(CHARACTERS) + 1).astype(
+        np.uint16
+    )
+
+
+def string_lengths(text):
+    """
+    Summary:
+        Lengths of the strings fuzz.WRatio compares for a normalized title: the
+        title itself, its words sorted and its distinct words sorted, joined with
+        single spaces.
+    """
+    words = text.split()
+    return len(text), len(" ".join(words)), len(" ".join(set(words)))
+
+
+def bigrams(text):
+    """
+    Summary:
+        Returns the set of character bigrams of a normalized title.
+    """
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def max_wratio(len1, len2):
+    """
+    Summary:
+        Upper bound of fuzz.WRatio for two strings of the given lengths.
+        Strings of very different lengths are compared with scaled partial ratios only.
+    """
+    len_ratio = max(len1, len2) / min(len1, len2)
+    if len_ratio < 1.5:
+        return 100
+    return 60 if len_ratio > 8 else 90
+
+
+def ratios(numerators, denominators):
+    """
+    Summary:
+        Element-wise ratios in percent of numerators that are at most their
+        denominators, 0 where both are 0. Rounded like fuzzywuzzy rounds them,
+        except that halves are always rounded up, as fuzzywuzzy's own floating
+        point ratio may land slightly above them.
+    """
+    return np.floor(100 * numerators / np.maximum(denominators, 1) + (0.5 + 1e-9))
+
+
+def max_wratios(
+    query_counts,
+    query_lengths,
+    query_n_bigrams,
+    counts,
+    lengths,
+    n_bigrams,
+    shared,
+    sect_lengths,
+    contained,
+):
+    """
+    Summary:
+        Upper bounds of fuzz.WRatio of a query and many titles, bounding each ratio
+        WRatio takes by the characters the compared strings can match:
+            - no more than they have in common,
+            - no more than leave every distinct bigram of one string that the other
+              lacks broken. An unmatched character breaks at most three bigrams,
+              the two it is part of in its string and one across it in the other,
+            - for partial ratios, all but one character of the shorter string at
+              most, unless it is a substring of the longer one,
+            - for token set ratios, the sorted words both strings share match
+              exactly, and when there are any the partial token set ratio is 100.
+        Ratios are rounded like WRatio rounds them, so the bounds are whole scores.
+    Parameters:
+        query_counts (ndarray): Character counts of the normalized query.
+        query_lengths (ndarray): string_lengths of the normalized query.
+        query_n_bigrams (int): Number of distinct bigrams of the normalized query.
+        counts (ndarray): Character counts of the normalized titles, one row per title.
+        lengths (ndarray): string_lengths of each normalized title, one row per title.
+        n_bigrams (ndarray): Number of distinct bigrams of each normalized title.
+        shared (ndarray): Number of distinct bigrams each title shares with the query.
+        sect_lengths (ndarray): Length of the sorted words each title shares with the
+            query, joined with single spaces. 0 if they share none.
+        contained (ndarray): Whether the shorter of the query and each title is a
+            substring of the other.
+    Returns:
+        ndarray: Highest score each title can get, 0 for titles without characters
+            in common with the query.
+    """
+    common = np.minimum(counts, query_counts).sum(axis=1)
+    # Columns are the titles, their sorted words and their sorted distinct words
+    shorter = np.minimum(lengths, query_lengths)
+    matched = np.minimum(shorter, common[:, None])
+    length, query_length, short = lengths[:, 0], query_lengths[0], shorter[:, 0]
+    query_missing = query_n_bigrams - shared
+    title_missing = n_bigrams - shared
+
+    # Full ratios of the three strings, the ratio of the shared words to the
+    # shorter distinct words, then partial ratios of the three strings
+    numerators = np.empty((len(counts), 7), dtype=np.int64)
+    numerators[:, :3] = matched
+    numerators[:, 3] = sect_lengths
+    numerators[:, 4:] = matched
+    numerators[:, 0] = np.minimum(
+        matched[:, 0],
+        np.minimum(
+            2 * query_length + length - query_missing, 2 * length + query_length - title_missing
+        )
+        // 3,
+    )
+    numerators[:, 4] = np.minimum(
+        np.minimum(matched[:, 0], np.where(contained, short, short - 1)),
+        (3 * short - np.where(query_length <= length, query_missing, title_missing)) // 3,
+    )
+    denominators = np.empty_like(numerators)
+    denominators[:, :3] = lengths + query_lengths
+    denominators[:, 3] = shorter[:, 2] + sect_lengths
+    denominators[:, 4:] = shorter + numerators[:, 4:]
+    percents = ratios(2 * numerators, denominators)
+    percents[sect_lengths > 0, 6] = 100
+
+    len_ratio = np.maximum(length, query_length) / np.maximum(short, 1)
+    # Strings of similar length, token sort and token set ratios
+    similar = 0.95 * percents[:, 1:4].max(axis=1)
+    # Strings of different lengths, the shorter one against substrings of the longer
+    different = np.where(len_ratio > 8, 0.6, 0.9) * np.maximum(
+        percents[:, 4], 0.95 * percents[:, 5:].max(axis=1)
+    )
+    bounds = np.round(np.maximum(percents[:, 0], np.where(len_ratio < 1.5, similar, different)))
+    bounds[common == 0] = 0
+    return bounds.astype(np.int64)
+
+
+def insert_sorted(positions, position):
+    """
+    Summary:
+        Returns a copy of a sorted postings array with the position inserted.
+    """
+    if positions is None:
+        return np.array([position], dtype=np.int32)
+    return np.insert(positions, np.searchsorted(positions, position), position)
+
+
+class TitleIndex:
+    """
+    Summary:
+        Prebuilt index for fuzzy title lookup. Titles are normalized once and
+        stored in character bigram and word postings. A query only rescores a short
+        list of candidates with fuzz.WRatio, the scorer used by process.extractOne,
+        instead of scanning every title. Candidates are:
+            - titles sharing the most bigrams with the query,
+            - titles that are substrings of the query or contain it,
+            - the first title sharing each query word, which WRatio rates highly
+              through its partial token set ratio.
+        Candidates are rescored in order of the highest score the characters,
+        bigrams and words they share with the query allow, skipping those that
+        can't beat the best score found, so the best candidate is always found.
+        Short or misspelled queries can share few bigrams with their best match.
+        If no candidate scores at least rescan_below, more of the titles sharing
+        the most bigrams are rescored the same way, at most max_rescanned of them
+        to keep the lookup fast. Such a query may get a different title than
+        extractOne. Like extractOne, the first of equally scored titles wins.
+    """
+
+    def __init__(
+        self,
+        titles,
+        n_candidates=16,
+        max_containing=8,
+        rescan_below=86,
+        n_rescan=64,
+        max_rescanned=4,
+    ):
+        """
+        Parameters:
+            titles (list[str]): Titles to index. Lookups return positions in this list.
+            n_candidates (int): Number of bigram-ranked candidates per query.
+            max_containing (int): Number of titles containing the query tried per query.
+            rescan_below (int): Best candidate score under which more titles are
+                rescanned. 86 is what a title sharing a word with the query gets
+                from its partial token set ratio.
+            n_rescan (int): Number of bigram-ranked titles a rescan considers.
+            max_rescanned (int): Number of titles a rescan rescores at most. Every
+                fuzz.WRatio call takes tens of microseconds.
+        """
+        self.titles = list(titles)
+        self.n_candidates = n_candidates
+        self.max_containing = max_containing
+        self.rescan_below = rescan_below
+        self.n_rescan = n_rescan
+        self.max_rescanned = max_rescanned
+        self.normalized = [normalize_title(title) for title in self.titles]
+        self.lengths = np.array([len(title) for title in self.normalized], dtype=np.int32)
+        self.char_counts = np.array(
+            [char_counts(title) for title in self.normalized], dtype=np.uint16
+        ).reshape(len(self.titles), len(CHARACTERS) + 1)
+        self.string_lengths = np.array(
+            [string_lengths(title) for title in self.normalized], dtype=np.int32
+        ).reshape(len(self.titles), 3)
+        self.words = [frozenset(title.split()) for title in self.normalized]
+        self.removed = set()
+        self.exact = {}
+        bigram_postings = defaultdict(list)
+        word_postings = defaultdict(list)
+        n_bigrams = []
+        for position, title in enumerate(self.normalized):
+            self.exact.setdefault(title, position)
+            grams = bigrams(title)
+            n_bigrams.append(len(grams))
+            for gram in grams:
+                bigram_postings[gram].append(position)
+            for word in set(title.split()):
+                word_postings[word].append(position)
+        self.n_bigrams = np.array(n_bigrams, dtype=np.int32)
+        self.bigram_postings = {
+            gram: np.array(positions, dtype=np.int32)
+            for gram, positions in bigram_postings.items()
+        }
+        self.word_postings = {
+            word: np.array(positions, dtype=np.int32)
+            for word, positions in word_postings.items()
+        }
+
+    def __len__(self):
+        return len(self.titles)
+
+    def copy(self):
+        """
+        Summary:
+            Returns an independent copy of the index, so changes can be made while
+            other threads keep searching the original. Postings arrays are shared,
+            changes replace them instead of modifying them.
+        """
+        index = object.__new__(TitleIndex)
+        index.__dict__.update(self.__dict__)
+        index.titles = list(self.titles)
+        index.normalized = list(self.normalized)
+        index.lengths = self.lengths.copy()
+        index.char_counts = self.char_counts.copy()
+        index.string_lengths = self.string_lengths.copy()
+        index.words = list(self.words)
+        index.removed = set(self.removed)
+        index.exact = dict(self.exact)
+        index.n_bigrams = self.n_bigrams.copy()
+        index.bigram_postings = dict(self.bigram_postings)
+        index.word_postings = dict(self.word_postings)
+        return index
+
+    def first_position(self):
+        """
+        Summary:
+            Returns the first position that wasn't removed, or None if there is none.
+        """
+        return next(
+            (position for position in range(len(self.titles)) if position not in self.removed),
+            None,
+        )
+
+    def add(self, title):
+        """
+        Summary:
+            Appends a title to the index.
+        Returns:
+            int: Position of the added title.
+        """
+        position = len(self.titles)
+        self.titles.append(title)
+        self.normalized.append(normalize_title(title))
+        self.lengths = np.append(self.lengths, np.int32(len(self.normalized[position])))
+        self.char_counts = np.vstack([self.char_counts, char_counts(self.normalized[position])])
+        self.string_lengths = np.vstack(
+            [self.string_lengths, string_lengths(self.normalized[position])]
+        ).astype(np.int32)
+        self.words.append(frozenset(self.normalized[position].split()))
+        self.n_bigrams = np.append(self.n_bigrams, np.int32(0))
+        self._index(position)
+        return position
+
+    def replace(self, position, title):
+        """
+        Summary:
+            Replaces the title at the given position.
+        """
+        self._unindex(position)
+        self.titles[position] = title
+        self.normalized[position] = normalize_title(title)
+        self.lengths[position] = len(self.normalized[position])
+        self.char_counts[position] = char_counts(self.normalized[position])
+        self.string_lengths[position] = string_lengths(self.normalized[position])
+        self.words[position] = frozenset(self.normalized[position].split())
+        self._index(position)
+
+    def remove(self, position):
+        """
+        Summary:
+            Removes the title at the given position. Positions of other titles don't change.
+        """
+        self._unindex(position)
+        self.char_counts[position] = 0
+        self.removed.add(position)
+
+    def _index(self, position):
+        title = self.normalized[position]
+        if self.exact.get(title, position) >= position:
+            self.exact[title] = position
+        grams = bigrams(title)
+        self.n_bigrams[position] = len(grams)
+        for gram in grams:
+            self.bigram_postings[gram] = insert_sorted(self.bigram_postings.get(gram), position)
+        for word in set(title.split()):
+            self.word_postings[word] = insert_sorted(self.word_postings.get(word), position)
+
+    def _unindex(self, position):
+        title = self.normalized[position]
+        if self.exact.get(title) == position:
+            # Fall back to the next title normalized the same way, if any
+            del self.exact[title]
+            for other in range(position + 1, len(self.titles)):
+                if self.normalized[other] == title and other not in self.removed:
+                    self.exact[title] = other
+                    break
+        for gram in bigrams(title):
+            postings = self.bigram_postings[gram]
+            self.bigram_postings[gram] = postings[postings != position]
+        for word in set(title.split()):
+            postings = self.word_postings[word]
+            self.word_postings[word] = postings[postings != position]
+        self.n_bigrams[position] = 0
+
+    def find(self, input):
+        """
+        Summary:
+            Finds the position of the title that most closely matches the input.
+            Handles some spelling mistakes.
+        Parameters:
+            input (str): The input movie title.
+        Returns:
+            int: Position of the best matching title, or None if the index is empty.
+        """
+        first_position = self.first_position()
+        if first_position is None:
+            return None
+        query = normalize_title(input)
+        if not query:
+            # Every title scores 0, extractOne returns the first one
+            return first_position
+        # An identical normalized title is the only way to score 100
+        if query in self.exact:
+            return self.exact[query]
+
+        scores = {}
+
+        def score(position):
+            if position not in scores:
+                scores[position] = fuzz.WRatio(
+                    query, self.normalized[position], full_process=False
+                )
+            return scores[position]
+
+        candidates = {}
+        # First title sharing a whole word with the query, per word. It's usually
+        # among the first postings of the word
+        words = set(query.split())
+        for word in words:
+            positions = self.word_postings.get(word)
+            if positions is None:
+                continue
+            for position in positions[:16].tolist():
+                if max_wratio(len(query), len(self.normalized[position])) == 90:
+                    candidates[position] = None
+                    break
+            else:
+                lengths = self.lengths[positions[16:]]
+                longer = np.maximum(lengths, len(query))
+                shorter = np.minimum(lengths, len(query))
+                in_partial_range = np.flatnonzero(
+                    (longer >= 1.5 * shorter) & (longer <= 8 * shorter)
+                )
+                if in_partial_range.size:
+                    candidates[int(positions[16 + in_partial_range[0]])] = None
+
+        query_bigrams = bigrams(query)
+        n_query_grams = len(query_bigrams)
+        query_grams = [
+            self.bigram_postings[gram] for gram in query_bigrams if gram in self.bigram_postings
+        ]
+        sharing = dice = np.empty(0, dtype=np.intp)
+        shared_bigrams = np.zeros(len(self.titles), dtype=np.intp)
+        if query_grams:
+            shared_bigrams = np.bincount(np.concatenate(query_grams), minlength=len(self.titles))
+            sharing = np.flatnonzero(shared_bigrams > 0)
+            shared = shared_bigrams[sharing]
+            n_bigrams = self.n_bigrams[sharing]
+            # Titles sharing the most bigrams relative to their size rank first
+            dice = shared / (n_query_grams + n_bigrams)
+        # Titles that appear inside the query, all their bigrams are in it
+        inside = {
+            position: None
+            for position in (sharing[shared == n_bigrams].tolist() if query_grams else ())
+            if self.normalized[position] in query
+        }
+        # Titles of a single character have no bigrams
+        for char in set(query):
+            if char in self.exact:
+                inside[self.exact[char]] = None
+        # Earliest titles containing the query
+        if len(query_grams) == n_query_grams:
+            if query_grams:
+                containing = sharing[shared == n_query_grams]
+            else:
+                # A single character has no bigrams, earliest titles with it are ranked
+                containing = np.flatnonzero(self.char_counts[:, char_counts(query).argmax()])
+                sharing = containing[: self.n_rescan]
+                dice = np.zeros(len(sharing))
+            tried = 0
+            for position in containing.tolist():
+                if tried == self.max_containing:
+                    break
+                if max_wratio(len(query), self.lengths[position]) == 90 and (
+                    query in self.normalized[position]
+                ):
+                    tried += 1
+                    if score(position) == 90:
+                        break
+
+        def ranked(n):
+            """
+            Summary:
+                Returns the n titles sharing the most bigrams relative to their size.
+            """
+            if len(sharing) > n:
+                top = np.argpartition(-dice, n - 1)[:n]
+            else:
+                top = np.arange(len(sharing))
+            return sharing[top[np.argsort(-dice[top], kind="stable")]].tolist()
+
+        candidates.update(dict.fromkeys(ranked(self.n_candidates)))
+        query_counts = char_counts(query)
+        query_lengths = np.array(string_lengths(query))
+
+        def rescore(positions, limit=None):
+            """
+            Summary:
+                Rescores titles in order of the highest score they can get, until
+                none can beat the best score found or limit more titles were scored.
+                A title that can only tie the best score is skipped if it comes after
+                the best title.
+            """
+            positions = np.array(
+                [position for position in positions if position not in scores], dtype=np.intp
+            )
+            if not positions.size:
+                return
+            sect_lengths, contained = [], []
+            for position in positions.tolist():
+                title = self.normalized[position]
+                sect_lengths.append(len(" ".join(words & self.words[position])))
+                contained.append(query in title if len(query) <= len(title) else title in query)
+            bounds = max_wratios(
+                query_counts,
+                query_lengths,
+                n_query_grams,
+                self.char_counts[positions],
+                self.string_lengths[positions],
+                self.n_bigrams[positions],
+                shared_bigrams[positions],
+                np.array(sect_lengths),
+                np.array(contained),
+            )
+            best, best_position = max(
+                ((value, -position) for position, value in scores.items()), default=(0, 0)
+            )
+            best_position = -best_position
+            order = np.lexsort((positions, -bounds))
+            rescored = 0
+            for bound, position in zip(bounds[order].tolist(), positions[order].tolist()):
+                if bound < max(best, 1) or rescored == limit:
+                    break
+                if bound == best and position > best_position:
+                    continue
+                value = score(position)
+                rescored += 1
+                if value > best or (value == best and position < best_position):
+                    best, best_position = value, position
+
+        rescore([*candidates, *inside])
+        if max(scores.values(), default=0) < self.rescan_below:
+            rescore(ranked(self.n_rescan), self.max_rescanned)
+
+        best = max(scores.values(), default=0)
+        if best == 0:
+            # Every title scores 0, extractOne returns the first one
+            return first_position
+        return min(position for position, value in scores.items() if value == best)
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def top_n(scores, n):
+    """
+    Summary:
+        Selects the n highest scores of every row without sorting the whole row.
+        The row is partially partitioned first, then only the winners are sorted.
+        Ties are resolved deterministically: among equal scores the lower position wins.
+    Parameters:
+        scores (ndarray): 1-D array of scores or 2-D array with one set of scores per row.
+        n (int): Number of positions to select per row.
+    Returns:
+        tuple[ndarray, ndarray]: Positions of the selected scores and the scores themselves,
+        highest score first. Same number of dimensions as the input.
+    """
+    scores = np.asarray(scores)
+    single_row = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    n_cols = scores.shape[1]
+    n = max(min(n, n_cols), 0)
+
+    if n == 0:
+        positions = np.empty((scores.shape[0], 0), dtype=np.intp)
+    elif n == n_cols:
+        positions = np.broadcast_to(np.arange(n_cols), scores.shape).copy()
+    else:
+        positions = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        # argpartition picks an arbitrary subset of the scores tied with the
+        # n-th best one. Redo the selection for such rows, lowest positions first
+        kth = np.take_along_axis(scores, positions, axis=1).min(axis=1, keepdims=True)
+        for row in np.flatnonzero((scores >= kth).sum(axis=1) > n):
+            above = np.flatnonzero(scores[row] > kth[row, 0])
+            tied = np.flatnonzero(scores[row] == kth[row, 0])
+            positions[row] = np.concatenate([above, tied[: n - above.size]])
+
+    values = np.take_along_axis(scores, positions, axis=1)
+    # Sort the winners by score descending, then by position ascending
+    order = np.lexsort((positions, -values), axis=1)
+    positions = np.take_along_axis(positions, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    if single_row:
+        return positions[0], values[0]
+    return positions, values
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from app.core.password_hasher import PasswordHasher
+
+
+def test_cancelled_queued_operation_releases_its_slot() -> None:
+    async def run() -> None:
+        hasher = PasswordHasher(max_workers=1, max_pending=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block() -> None:
+            started.set()
+            release.wait()
+
+        running = asyncio.create_task(hasher._run("hash", block))
+        await asyncio.to_thread(started.wait)
+        queued = asyncio.create_task(hasher._run("hash", block))
+        await asyncio.sleep(0)
+        assert hasher.in_flight == 2
+
+        queued.cancel()
+        # The cancellation reaches the queued operation before the task ends, so
+        # the worker is only released once it can't pick the operation up anymore
+        await asyncio.gather(queued, return_exceptions=True)
+        release.set()
+        await running
+        hasher.shutdown()
+
+        assert queued.cancelled()
+        assert hasher.in_flight == 0
+        assert hasher.timings["hash"].count == 1
+
+    asyncio.run(run())
@@ -0,0 +1,129 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.models import Item
+from app.recommender.engine import RecommenderEngine
+from app.recommender.utils.artifacts import load_artifacts
+from app.recommender.utils.calc_cosine_sim import calc_cosine_sim
+
+K = 4
+# Small token pools, so movies share features and tie often
+POOLS = {
+    "franchise": ["alien", "batman", "rocky"],
+    "director": ["ridley scott", "christopher nolan", "james cameron"],
+    "top_actors": ["sigourney weaver", "christian bale", "michael caine", "tom hardy"],
+    "genres": ["action", "horror", "drama", "science fiction"],
+    "keywords": ["space", "robot", "boxing", "gotham", "sequel"],
+}
+
+
+class FixedCatalog:
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df
+
+    def load(self, force: bool = False) -> pd.DataFrame:
+        return self.df
+
+
+def movie(item_id: int, **fields: str) -> dict:
+    return {
+        "id": item_id,
+        "title": f"Movie {item_id}",
+        "release_year": "2000",
+        **dict.fromkeys(POOLS),
+        **fields,
+    }
+
+
+def random_movie(rng: random.Random, item_id: int) -> dict:
+    return movie(
+        item_id,
+        **{field: ", ".join(rng.sample(pool, rng.randint(0, 2))) for field, pool in POOLS.items()},
+    )
+
+
+def build_engine(movies: dict, tmp_path) -> RecommenderEngine:
+    df = pd.DataFrame(list(movies.values()))
+    calc_cosine_sim(
+        df, path=tmp_path / "engine", force_calculation=True, k=K, workers=1, mode="exact"
+    )
+    return RecommenderEngine.load(path=tmp_path / "engine", catalog=FixedCatalog(df))
+
+
+def assert_matches_rebuild(engine: RecommenderEngine, movies: dict, tmp_path) -> None:
+    # Saving compacts away deleted rows, the rebuild uses the same row order
+    engine.save(tmp_path / "engine")
+    _, arrays, _ = load_artifacts(tmp_path / "engine")
+    df = pd.DataFrame([movies[item_id] for item_id in arrays["item_ids"].tolist()])
+    neighbor_ids, neighbor_scores = calc_cosine_sim(
+        df, path=tmp_path / "rebuild", force_calculation=True, k=K, workers=1, mode="exact"
+    )
+    width = neighbor_ids.shape[1]
+    np.testing.assert_array_equal(arrays["neighbor_ids"][:, :width], neighbor_ids)
+    np.testing.assert_allclose(arrays["neighbor_scores"][:, :width], neighbor_scores, atol=1e-6)
+    # Lists with fewer than K other movies to rank are padded
+    assert (arrays["neighbor_ids"][:, width:] == -1).all()
+    assert np.isneginf(arrays["neighbor_scores"][:, width:]).all()
+
+
+def test_incremental_updates_match_full_rebuild(tmp_path, monkeypatch) -> None:
+    # Without IDF the refit of the rebuild weighs tokens like the fitted engine
+    monkeypatch.setattr(settings, "RECOMMENDER_USE_IDF", False)
+    rng = random.Random(0)
+    # Movie 1 holds every token and is never removed, so no token is ever unseen
+    movies = {1: movie(1, **{field: ", ".join(pool) for field, pool in POOLS.items()})}
+    movies.update((item_id, random_movie(rng, item_id)) for item_id in range(2, 13))
+    engine = build_engine(movies, tmp_path)
+    next_id = 13
+    for _ in range(60):
+        live = sorted(engine.id_to_row)
+        if rng.random() < 0.25 and len(live) > K + 2:
+            item_id = rng.choice(live[1:])
+            engine.remove_item(item_id)
+            del movies[item_id]
+        else:
+            if rng.random() < 0.5:
+                item_id = rng.choice(live[1:])
+            else:
+                item_id, next_id = next_id, next_id + 1
+            if rng.random() < 0.3:
+                # Same tokens as another movie, so scores tie at the K-th neighbor
+                twin = movies[rng.choice(live)]
+                movies[item_id] = movie(item_id, **{field: twin[field] for field in POOLS})
+            else:
+                movies[item_id] = random_movie(rng, item_id)
+            engine.upsert_item(Item(**movies[item_id]))
+        assert_matches_rebuild(engine, movies, tmp_path)
+    assert not engine.unseen_tokens
+
+    # Remove movies until lists can't be filled anymore
+    for item_id in sorted(engine.id_to_row)[1:-2]:
+        engine.remove_item(item_id)
+        del movies[item_id]
+        assert_matches_rebuild(engine, movies, tmp_path)
+    assert len(movies) <= K
+
+
+def test_ties_at_the_kth_neighbor_are_ordered_by_row(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RECOMMENDER_USE_IDF", False)
+    genres = ["action, drama", "horror", "action", "action", "action", "action", "action, drama"]
+    movies = {
+        item_id: movie(item_id, genres=genre) for item_id, genre in enumerate(genres, start=1)
+    }
+    engine = build_engine(movies, tmp_path)
+    # Row of every movie is its id minus one. Movie 1 ranks 7, 3, 4 and 5,
+    # movie 6 ties with 5 but comes after it
+    assert engine.neighbor_ids[0].tolist() == [6, 2, 3, 4]
+    # Movie 2 ties with the K-th neighbor of movie 1 and comes before it, so it enters
+    movies[2]["genres"] = "action"
+    engine.upsert_item(Item(**movies[2]))
+    assert engine.neighbor_ids[0].tolist() == [6, 1, 2, 3]
+    assert_matches_rebuild(engine, movies, tmp_path)
+    # Movie 7 drops to a tie with the K-th neighbor and comes after movie 5, so it leaves
+    movies[7]["genres"] = "action"
+    engine.upsert_item(Item(**movies[7]))
+    assert engine.neighbor_ids[0].tolist() == [1, 2, 3, 4]
+    assert_matches_rebuild(engine, movies, tmp_path)
@@ -0,0 +1,78 @@
+"""
+Measures the recall@K of the approximate neighbor index against the exact
+top-K neighbors of the shipped catalog, and the build time of both, for a
+grid of random projection settings. Recall@K is the share of the exact
+top-K neighbors of a movie that the approximate index also returns among
+its top K, averaged over all movies.
+
+Run from the 'backend' directory:
+    python -m benchmarks.bench_approximate_neighbors
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.recommender.utils.approximate_neighbors import approximate_top_k_neighbors
+from app.recommender.utils.calc_cosine_sim import top_k_neighbors
+from app.recommender.utils.feature_engine import FeatureEngine
+
+MOVIES_DATA_PATH = "../DA_skill_showcase/data/recommender_data.csv"
+K = 50
+RECALL_AT = (3, 10, K)
+
+# n_tables, n_bits, n_candidates
+SETTINGS = [
+    (16, 8, None),
+    (32, 8, None),
+    (64, 8, None),
+    (64, 8, 1024),
+    (32, 10, None),
+    (64, 10, None),
+]
+
+
+def recall_at(exact_ids, approximate_ids, k):
+    """
+    Summary:
+        Average share of the exact top-k neighbors found among the approximate top-k.
+    """
+    found = [
+        np.intersect1d(exact[:k], approximate[:k]).size
+        for exact, approximate in zip(exact_ids, approximate_ids)
+    ]
+    return np.mean(found) / k
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    features = FeatureEngine().fit_transform(pd.read_csv(MOVIES_DATA_PATH))
+    print(f"{features.shape[0]} movies, {features.shape[1]} tokens, K = {K}")
+    (exact_ids, _), exact_time = timed(top_k_neighbors, features, k=K)
+    print(f"{'exact':>26}: {exact_time:6.2f} s")
+
+    header = "  ".join(f"recall@{k:<3}" for k in RECALL_AT)
+    print(f"{'tables x bits, candidates':>26}  {'build':>8}  {header}")
+    for n_tables, n_bits, n_candidates in SETTINGS:
+        (approximate_ids, _), approximate_time = timed(
+            approximate_top_k_neighbors,
+            features,
+            k=K,
+            n_tables=n_tables,
+            n_bits=n_bits,
+            n_candidates=n_candidates,
+        )
+        recalls = "  ".join(
+            f"{recall_at(exact_ids, approximate_ids, k):>10.3f}" for k in RECALL_AT
+        )
+        name = f"{n_tables} x {n_bits}, {n_candidates or 'all'}"
+        print(f"{name:>26}  {approximate_time:6.2f} s  {recalls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Checks that the indexed title lookup returns the same best match as
+fuzzywuzzy's process.extractOne and compares their per-query latency.
+Fails if a match differs or the p95 latency of the index is over budget.
+
+Run from the 'backend' directory:
+    python -m benchmarks.bench_find_movie
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import process
+
+from app.recommender.utils.title_index import TitleIndex
+
+MOVIES_DATA_PATH = "../DA_skill_showcase/data/recommender_data.csv"
+# p95 latency over every call of the index, in milliseconds
+LATENCY_BUDGET_MS = 1.0
+# Runs of every query through the index. extractOne is only run once
+REPEAT = 5
+
+# Misspelled queries and the title process.extractOne matches them with
+REGRESSION_SET = [
+    ("toy stroy", "Troy"),
+    ("jumaji", "Jumanji"),
+    ("the godfater", "The Godfather"),
+    ("godfather part 2", "Go"),
+    ("star wras", "Star Wars"),
+    ("empire strikes back", "The Empire Strikes Back"),
+    ("pulp ficton", "Pulp Fiction"),
+    ("forest gump", "Forrest Gump"),
+    ("the matrx", "The Matrix"),
+    ("matrix reloded", "The Matrix Revolutions"),
+    ("lord of the rigns", "The Lord of the Rings"),
+    ("fellowship of the ring", "The Lord of the Rings: The Fellowship of the Ring"),
+    ("harry poter", "When Harry Met Sally..."),
+    ("the dark knigt", "The Dark Knight"),
+    ("inceptoin", "Inception"),
+    ("interstelar", "Interstellar"),
+    ("titanik", "Titanic"),
+    ("the lion kng", "The Lion King"),
+    ("finding nemoo", "Finding Nemo"),
+    ("shawshank redemtion", "Red"),
+    ("fight clob", "Fight Club"),
+    ("gladiater", "Gladiator"),
+    ("back to the futur", "Back to the Future"),
+    ("jurasic park", "Jurassic Park"),
+    ("terminater 2", "Free Willy 2 - The Adventure Home"),
+    ("avatr", "Avatar"),
+    ("the avengrs", "The Avengers"),
+    ("spider man", "Spider-Man"),
+    ("batman begns", "Batman Begins"),
+    ("goodfelas", "GoodFellas"),
+    ("schindlers list", "Schindler's List"),
+    ("amelie", "Amélie"),
+    ("spirited awy", "Spirited Away"),
+    ("the incredibels", "The Incredibles"),
+    ("wall e", "WALL·E"),
+    ("ratatoulle", "Ratatouille"),
+    ("casablanka", "Casablanca"),
+    ("la la lnd", "La La Land"),
+    ("mad max fury road", "Mad Max: Fury Road"),
+    ("blade runer", "Blade Runner"),
+    ("monsters inc", "Monsters, Inc."),
+    ("saving private ryn", "Saving Private Ryan"),
+    ("parasite", "Parasyte: Part 1"),
+    ("the phantom of the  opera", "The Phantom of the Opera"),
+    (
+        "the land before time vii: the ston eof cold fire",
+        "The Land Before Time VII: The Stone of Cold Fire",
+    ),
+    ("the disapearance of eleanor rigby: him", "The Disappearance of Eleanor Rigby: Him"),
+]
+
+
+def timed(func, queries, repeat=1):
+    """
+    Summary:
+        Runs func repeat times on every query and times every call.
+    Returns:
+        tuple[list, ndarray]: Result for every query and the latency of every
+            call in milliseconds.
+    """
+    results, latencies = [], []
+    for query in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result)
+    return results, np.array(latencies)
+
+
+def report(name, latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:>12}: p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms")
+
+
+def main() -> None:
+    titles = pd.read_csv(MOVIES_DATA_PATH)["title"].tolist()
+    start = time.perf_counter()
+    title_index = TitleIndex(titles)
+    print(f"Index built in {(time.perf_counter() - start) * 1000:.0f} ms for {len(titles)} titles")
+
+    queries = [query for query, _ in REGRESSION_SET]
+    expected = [title for _, title in REGRESSION_SET]
+    legacy, legacy_latencies = timed(lambda query: process.extractOne(query, titles)[0], queries)
+    indexed, indexed_latencies = timed(
+        lambda query: titles[title_index.find(query)], queries, REPEAT
+    )
+
+    mismatches = [
+        (query, title, old, new)
+        for query, title, old, new in zip(queries, expected, legacy, indexed)
+        if not title == old == new
+    ]
+    for query, title, old, new in mismatches:
+        print(f"MISMATCH {query!r}: expected {title!r}, extractOne {old!r}, index {new!r}")
+    print(f"{len(queries) - len(mismatches)}/{len(queries)} queries match")
+    report("extractOne", legacy_latencies)
+    report("TitleIndex", indexed_latencies)
+    p95 = np.percentile(indexed_latencies, 95)
+    over_budget = p95 > LATENCY_BUDGET_MS
+    if over_budget:
+        print(f"OVER BUDGET: TitleIndex p95 {p95:.3f} ms, budget {LATENCY_BUDGET_MS:.3f} ms")
+    if mismatches or over_budget:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
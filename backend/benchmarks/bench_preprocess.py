@@ -0,0 +1,94 @@
+"""
+Compares the per-row preprocess() + default CountVectorizer pipeline the
+recommender used to run with the single-pass analyzer of the feature engine,
+over the combined feature string the recommender used to vectorize.
+Checks that both produce the same vocabulary and counts, and reports timings.
+
+Run from the 'backend' directory:
+    python -m benchmarks.bench_preprocess
+"""
+import re
+import time
+
+import nltk
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+from app.recommender.utils.feature_engine import analyze
+
+MOVIES_DATA_PATH = "../DA_skill_showcase/data/recommender_data.csv"
+
+
+def combine_features(df):
+    """
+    Summary:
+        The original combined string of a movie, with the director repeated twice.
+    """
+    return (
+        df["franchise"].fillna("") + "; " +
+        df["director"].fillna("") + "; " +
+        df["director"].fillna("") + "; " +
+        df["top_actors"].fillna("") + "; " +
+        df["genres"].fillna("") + "; " +
+        df["keywords"].fillna("")
+    )
+
+
+def legacy_preprocess(text):
+    """
+    Summary:
+        The original preprocess(): builds a tokenizer and reloads the
+        stopword list for every row.
+    """
+    if not isinstance(text, str):
+        return ""
+    text = re.sub(r"[^0-9a-zA-Z\s]", "", text, re.I | re.A).lower().strip()
+    wpt = nltk.WordPunctTokenizer()
+    stop_words = nltk.corpus.stopwords.words("english")
+    output = []
+    tokens = wpt.tokenize(text)
+    filtered_tokens = [token for token in tokens if token not in stop_words]
+    output.append(" ".join(filtered_tokens))
+    return " ".join(output)
+
+
+def legacy_vectorize(combined):
+    cv = CountVectorizer()
+    return cv, cv.fit_transform(combined.apply(legacy_preprocess))
+
+
+def vectorize(combined):
+    cv = CountVectorizer(analyzer=analyze)
+    return cv, cv.fit_transform(combined)
+
+
+def best_of(func, *args, repeat=3):
+    """
+    Summary:
+        Runs func several times and returns its last result and the fastest run in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main() -> None:
+    combined = combine_features(pd.read_csv(MOVIES_DATA_PATH))
+    (legacy_cv, legacy_matrix), legacy_time = best_of(legacy_vectorize, combined)
+    (cv, matrix), new_time = best_of(vectorize, combined)
+
+    same_vocabulary = legacy_cv.vocabulary_ == cv.vocabulary_
+    same_counts = same_vocabulary and (legacy_matrix != matrix).nnz == 0
+    print(f"{len(combined)} movies, {len(cv.vocabulary_)} tokens in vocabulary")
+    print(f"Identical vocabulary: {same_vocabulary}, identical counts: {same_counts}")
+    print(f"preprocess + CountVectorizer: {legacy_time:.3f} s")
+    print(f"  single-pass analyzer      : {new_time:.3f} s ({legacy_time / new_time:.1f}x faster)")
+    if not same_counts:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
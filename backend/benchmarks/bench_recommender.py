@@ -0,0 +1,177 @@
+"""
+End-to-end recommender benchmark. For every catalog size it loads the movies
+into a local SQLite database standing in for PostgreSQL, builds the recommender
+the way the app does on startup, and reports:
+    - catalog load, full build and engine load times,
+    - peak RSS of the run and size of the written artifacts,
+    - p50/p95/p99 latency of find_movie() and recommender() on misspelled titles.
+The shipped catalog is used as is. Larger catalogs are synthetic: every field
+of a synthetic movie is drawn from a random movie of the shipped catalog, so
+token frequencies stay realistic. Every size runs in its own process, so its
+peak RSS isn't inflated by the previous ones.
+
+Run from the 'backend' directory:
+    python -m benchmarks.bench_recommender
+    python -m benchmarks.bench_recommender --sizes 10000 100000 1000000 --mode approximate
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlmodel import SQLModel, create_engine
+
+from app.models import Item  # noqa: F401, registers table 'item'
+from app.recommender.engine import RecommenderEngine
+from app.recommender.recommender import recommender
+from app.recommender.utils.catalog import CatalogLoader
+from app.recommender.utils.feature_engine import FIELDS
+from app.recommender.utils.find_movie import find_movie
+
+MOVIES_DATA_PATH = "../DA_skill_showcase/data/recommender_data.csv"
+N_QUERIES = 200
+SEED = 0
+
+
+def synthetic_catalog(movies, size, rng):
+    """
+    Summary:
+        Returns a catalog of the given size. The shipped movies come first, the
+        others get every field from an independently drawn shipped movie.
+    """
+    if size <= len(movies):
+        return movies.iloc[:size].reset_index(drop=True)
+    n_new = size - len(movies)
+    new = pd.DataFrame(
+        {
+            column: movies[column].to_numpy()[rng.integers(len(movies), size=n_new)]
+            for column in ("title", "release_year", "vote_average", "vote_count", *FIELDS)
+        }
+    )
+    new["title"] = new["title"] + " " + np.arange(len(movies), size).astype(str)
+    return pd.concat([movies, new], ignore_index=True)
+
+
+def misspell(title, rng):
+    """
+    Summary:
+        Swaps two neighboring characters of a title, like a typo would.
+    """
+    if len(title) < 4:
+        return title
+    i = int(rng.integers(len(title) - 1))
+    return title[:i] + title[i + 1] + title[i] + title[i + 2 :]
+
+
+def percentiles(latencies):
+    return dict(zip(("p50", "p95", "p99"), np.percentile(latencies, [50, 95, 99])))
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def run_size(size):
+    """
+    Summary:
+        Benchmarks one catalog size. Runs in a fresh process, which reads the
+        neighbor mode from the environment set by main().
+    Returns:
+        dict: Measurements of the run.
+    """
+    rng = np.random.default_rng(SEED)
+    movies = pd.read_csv(MOVIES_DATA_PATH).drop(columns=["id"])
+    movies = synthetic_catalog(movies, size, rng)
+    work_dir = tempfile.mkdtemp(prefix="bench_recommender_")
+    try:
+        db_engine = create_engine(f"sqlite:///{os.path.join(work_dir, 'app.db')}")
+        SQLModel.metadata.create_all(db_engine)
+        movies.assign(owner_id=1).to_sql("item", db_engine, if_exists="append", index=False)
+        catalog = CatalogLoader(db_engine=db_engine)
+        _, load_time = timed(catalog.load)
+        artifacts_path = os.path.join(work_dir, "artifacts")
+        # The first load finds no artifacts and builds them, the second one only maps them
+        _, build_time = timed(RecommenderEngine.load, path=artifacts_path, catalog=catalog)
+        rec_engine, engine_time = timed(
+            RecommenderEngine.load, path=artifacts_path, catalog=catalog
+        )
+
+        titles = rec_engine.catalog["title"].to_numpy()
+        queries = [
+            misspell(str(title), rng)
+            for title in titles[rng.integers(len(titles), size=N_QUERIES)]
+        ]
+        lookup, recommend = [], []
+        for query in queries:
+            lookup.append(timed(find_movie, query, *rec_engine.lookup_state())[1])
+            recommend.append(timed(recommender, query, 10, rec_engine=rec_engine)[1])
+        return {
+            "size": size,
+            "catalog_load": load_time,
+            "build": build_time,
+            "engine_load": engine_time,
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (1 << 20 if sys.platform == "darwin" else 1 << 10),
+            "artifacts_mb": directory_size(artifacts_path) / (1 << 20),
+            "find_movie": percentiles(np.array(lookup) * 1000),
+            "recommender": percentiles(np.array(recommend) * 1000),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def report(result):
+    print(f"--- {result['size']} movies")
+    print(
+        f"catalog load {result['catalog_load']:.2f} s, build {result['build']:.2f} s, "
+        f"engine load {result['engine_load']:.2f} s"
+    )
+    print(
+        f"peak RSS {result['peak_rss_mb']:.0f} MB, artifacts {result['artifacts_mb']:.1f} MB"
+    )
+    for name in ("find_movie", "recommender"):
+        latencies = ", ".join(f"{key} {value:.3f} ms" for key, value in result[name].items())
+        print(f"{name:>12}: {latencies}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_342, 100_000],
+        help="Catalog sizes to benchmark. The exact build grows quadratically, "
+        "1000000 is only practical with --mode approximate.",
+    )
+    parser.add_argument("--mode", choices=("exact", "approximate"), default="exact")
+    args = parser.parse_args()
+
+    # The settings are read when a worker imports the app, so the mode has to be
+    # in the environment it is spawned with
+    os.environ["RECOMMENDER_NEIGHBOR_MODE"] = args.mode
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        with context.Pool(1) as pool:
+            report(pool.apply(run_size, (size,)))
+
+
+if __name__ == "__main__":
+    main()